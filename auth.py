@@ -0,0 +1,132 @@
+import os
+import time
+import bcrypt
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from threading import Lock
+from metrics import REGISTRY
+
+__all__ = [
+    "AuthQueueFull",
+    "AuthExecutor"
+]
+
+
+BCRYPT_SECONDS = REGISTRY.histogram(
+        "tictactoe_bcrypt_seconds",
+        "Time spent in bcrypt by the auth workers"
+        )
+
+
+class AuthQueueFull(Exception):
+    pass
+
+
+#############################################################
+############### Run inside the worker processes #############
+#############################################################
+
+# each returns its result, when it started and how long bcrypt took
+
+def _check_password(password: str, hash: str) -> tuple[bool, float, float]:
+    started = time.monotonic()
+    matches = bcrypt.checkpw(password.encode(), hash.encode())
+    return matches, started, time.monotonic() - started
+
+
+def _hash_password(password: str) -> tuple[str, float, float]:
+    started = time.monotonic()
+    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return hashed, started, time.monotonic() - started
+
+#############################################################
+
+
+class AuthExecutor:
+    """
+    Runs bcrypt in a pool of worker processes so hashing never blocks the
+    thread or event loop handling connections. At most max_queue jobs may be
+    queued or running at once, anything past that is rejected with
+    AuthQueueFull so a login storm can't grow the backlog without bound
+    """
+    def __init__(self, workers: int | None = None, max_queue: int = 1024) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        # workers are started as bcrypt jobs arrive, so forking them straight
+        # from the server would hand them a copy of every socket open at the
+        # time, keeping closed connections open. A fork server is started
+        # from a clean process instead
+        self._pool = ProcessPoolExecutor(
+                max_workers = self.workers,
+                mp_context = multiprocessing.get_context("forkserver")
+                )
+
+        self._lock = Lock()
+        self._depth = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def check_password(self, password: str, hash: str) -> Future:
+        """
+        Returns a future resolving to whether password matches hash
+        """
+        return self._submit(_check_password, password, hash)
+
+    def hash_password(self, password: str) -> Future:
+        """
+        Returns a future resolving to the str hash of password
+        """
+        return self._submit(_hash_password, password)
+
+    def _submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self._depth >= self.max_queue:
+                self._rejected += 1
+                raise AuthQueueFull(f"{self._depth} auth jobs already queued")
+
+            self._depth += 1
+
+        submitted = time.monotonic()
+        result = Future()
+
+        def finish(job: Future) -> None:
+            with self._lock:
+                self._depth -= 1
+
+            if (error := job.exception()) is not None:
+                result.set_exception(error)
+                return
+
+            value, started, elapsed = job.result()
+            BCRYPT_SECONDS.observe(elapsed)
+
+            with self._lock:
+                wait = max(0.0, started - submitted)
+                self._completed += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+            result.set_result(value)
+
+        self._pool.submit(fn, *args).add_done_callback(finish)
+        return result
+
+    def metrics(self) -> dict[str, float]:
+        """
+        Queue depth counts jobs waiting for or running on a worker. Wait times
+        are how long completed jobs sat in the queue before starting
+        """
+        with self._lock:
+            return {
+                    "queue_depth": self._depth,
+                    "max_queue": self.max_queue,
+                    "completed": self._completed,
+                    "rejected": self._rejected,
+                    "wait_seconds_total": self._total_wait,
+                    "wait_seconds_max": self._max_wait,
+                    }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait = False, cancel_futures = True)
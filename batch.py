@@ -0,0 +1,76 @@
+import numpy as np
+import bitboard
+
+__all__ = [
+    "IN_PROGRESS",
+    "CROSS_WINS",
+    "NOUGHT_WINS",
+    "DRAW",
+    "boards_from_statuses",
+    "evaluate"
+]
+
+
+# results of evaluate, the same for every board in a batch
+IN_PROGRESS = 0
+CROSS_WINS = 1
+NOUGHT_WINS = 2
+DRAW = 3
+
+CELLS = bitboard.SIZE * bitboard.SIZE
+
+# weight of each cell when packing a row of the batch into a bitboard
+_CELL_BITS = (1 << np.arange(CELLS)).astype(np.uint16)
+# weight of each cell when reading a row of the batch as a base 3 number
+_CELL_DIGITS = (3 ** np.arange(CELLS)).astype(np.int16)
+# whether each bitboard contains one of bitboard.WIN_MASKS
+_WINNING = np.array(
+        [bitboard.wins(bits) for bits in range(bitboard.FULL + 1)], dtype = bool
+        )
+
+
+def _results_table() -> np.ndarray:
+    """
+    The result of every board, indexed by the board read as a base 3 number
+    """
+    boards = (np.arange(3 ** CELLS)[:, None] // _CELL_DIGITS) % 3
+    crosses = (boards == 1).astype(np.uint16) @ _CELL_BITS
+    noughts = (boards == 2).astype(np.uint16) @ _CELL_BITS
+
+    results = np.full(len(boards), IN_PROGRESS, dtype = np.int8)
+    results[(crosses | noughts) == bitboard.FULL] = DRAW
+    # a win on the last move fills the board too, so wins are set after
+    # draws, and crosses after noughts for boards no game could reach
+    results[_WINNING[noughts]] = NOUGHT_WINS
+    results[_WINNING[crosses]] = CROSS_WINS
+    return results
+
+
+_RESULTS = _results_table()
+
+
+def boards_from_statuses(statuses: list[str]) -> np.ndarray:
+    """
+    Converts board statuses from Room.get_board_status, a digit per cell, into
+    an (N, 9) int8 array for evaluate
+    """
+    data = np.frombuffer("".join(statuses).encode(), dtype = np.uint8)
+    return (data - ord("0")).astype(np.int8).reshape(-1, CELLS)
+
+
+def evaluate(boards: np.ndarray) -> np.ndarray:
+    """
+    Takes an (N, 9) int8 array of boards in Room.get_board_status order,
+    0 for empty, 1 for a cross and 2 for a nought. Returns an (N,) int8 array
+    of IN_PROGRESS, CROSS_WINS, NOUGHT_WINS or DRAW for each board.
+
+    Each row is read as a base 3 number and its result looked up in a table
+    made from bitboard.WIN_MASKS for all 3^9 boards, so the whole batch is
+    one matrix product and one gather instead of a Python loop
+    """
+    boards = np.asarray(boards)
+
+    if boards.ndim != 2 or boards.shape[1] != CELLS:
+        raise ValueError(f"Expected an (N, {CELLS}) array, got {boards.shape}")
+
+    return _RESULTS[boards.astype(np.int16) @ _CELL_DIGITS]
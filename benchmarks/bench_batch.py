@@ -0,0 +1,91 @@
+"""
+Compares evaluating a batch of random boards one at a time, through
+game.player_wins and game.players_draw and through the bitboard engine,
+against batch.evaluate on the whole batch at once. Needs numpy.
+
+    python benchmarks/bench_batch.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+import game
+import batch
+import bitboard
+
+
+BATCH_SIZES = [1_000, 100_000, 1_000_000]
+# the scalar paths are timed on at most this many boards and scaled up
+SCALAR_LIMIT = 100_000
+MARKS = [game.EMPTY, game.CROSS, game.NOUGHT]
+
+
+def scalar_game(boards: np.ndarray) -> list[int]:
+    results = []
+    for row in boards.tolist():
+        board = [[MARKS[row[y * 3 + x]] for x in range(3)] for y in range(3)]
+
+        if game.player_wins(game.CROSS, board):
+            results.append(batch.CROSS_WINS)
+        elif game.player_wins(game.NOUGHT, board):
+            results.append(batch.NOUGHT_WINS)
+        elif game.players_draw(board):
+            results.append(batch.DRAW)
+        else:
+            results.append(batch.IN_PROGRESS)
+    return results
+
+
+def scalar_bitboard(boards: np.ndarray) -> list[int]:
+    results = []
+    for row in boards.tolist():
+        crosses = noughts = 0
+        for i, mark in enumerate(row):
+            if mark == 1:
+                crosses |= 1 << i
+            elif mark == 2:
+                noughts |= 1 << i
+
+        if bitboard.wins(crosses):
+            results.append(batch.CROSS_WINS)
+        elif bitboard.wins(noughts):
+            results.append(batch.NOUGHT_WINS)
+        elif bitboard.is_full(crosses, noughts):
+            results.append(batch.DRAW)
+        else:
+            results.append(batch.IN_PROGRESS)
+    return results
+
+
+def timed(fn, boards: np.ndarray) -> tuple[float, list[int]]:
+    """Returns nanoseconds per board and the results"""
+    start = time.perf_counter_ns()
+    results = fn(boards)
+    return (time.perf_counter_ns() - start) / len(boards), list(results)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+
+    print(f"{'boards':>10} {'game.py':>10} {'bitboard':>10} {'batch':>10}")
+    for n in BATCH_SIZES:
+        boards = rng.integers(0, 3, size = (n, 9), dtype = np.int8)
+        sample = boards[:SCALAR_LIMIT]
+
+        game_ns, game_results = timed(scalar_game, sample)
+        bits_ns, bits_results = timed(scalar_bitboard, sample)
+        batch_ns, batch_results = timed(batch.evaluate, boards)
+
+        assert game_results == bits_results == batch_results[:len(sample)]
+
+        print(
+            f"{n:>10} {game_ns:>7.0f} ns {bits_ns:>7.0f} ns {batch_ns:>7.1f} ns"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Times broadcasting BOARDSTATUS to a room with 1,000 viewers, comparing
+encoding the frame once per recipient (as play_game used to) with
+Server.broadcast, which encodes it once and shares the frame. Both only
+queue frames, which each client's writer thread then sends. Viewers are
+connected over socketpairs that are drained between rounds. Needs about
+2,000 file descriptors, raise the limit with ulimit -n if necessary.
+
+    python benchmarks/bench_broadcast.py
+"""
+import os
+import sys
+import time
+import socket
+from threading import Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from room import Room
+from server import Client, Server
+
+
+VIEWERS = 1_000
+ROUNDS = 200
+
+
+def make_room() -> tuple[Room, list[socket.socket]]:
+    room = Room("bench")
+    readers = []
+
+    for _ in range(VIEWERS):
+        server_side, client_side = socket.socketpair()
+        client_side.setblocking(False)
+
+        client = Client(server_side)
+        Thread(target = client.write_outbound, daemon = True).start()
+        room.clients[client] = None
+        readers.append(client_side)
+
+    return room, readers
+
+
+def drain(readers: list[socket.socket]) -> None:
+    for reader in readers:
+        try:
+            while reader.recv(1 << 16):
+                pass
+        except BlockingIOError:
+            pass
+
+
+def per_recipient(room: Room, board_status: str) -> None:
+    for client in Server.room_clients(room):
+        client.send_message(f"BOARDSTATUS:{board_status}".encode())
+
+
+def encode_once(room: Room, board_status: str) -> None:
+    Server.broadcast(room, f"BOARDSTATUS:{board_status}")
+
+
+def bench(broadcast, room: Room, readers: list[socket.socket]) -> float:
+    """Returns mean milliseconds per broadcast"""
+    elapsed = 0.0
+
+    for i in range(ROUNDS):
+        board_status = f"{i % 3}" * 9
+
+        start = time.perf_counter()
+        broadcast(room, board_status)
+        elapsed += time.perf_counter() - start
+
+        drain(readers)
+
+    return elapsed / ROUNDS * 1e3
+
+
+def main() -> None:
+    room, readers = make_room()
+
+    print(f"{VIEWERS} viewers, {ROUNDS} rounds")
+    for name, broadcast in [
+            ("per recipient", per_recipient),
+            ("encode once", encode_once)
+            ]:
+        print(f"{name:<14} {bench(broadcast, room, readers):>7.3f} ms/broadcast")
+
+
+if __name__ == "__main__":
+    main()
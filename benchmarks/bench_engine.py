@@ -0,0 +1,157 @@
+"""
+Compares the list of lists board Room used to keep, with the win and draw
+checks game.py used to make by scanning it, against the bitboard engine.
+Times checking for a win, checking for a draw, encoding BOARDSTATUS and a
+whole game of placing a move and checking the result each turn. Both engines
+are first checked to agree on every possible board.
+
+    python benchmarks/bench_engine.py
+"""
+import os
+import sys
+import time
+import random
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bitboard
+from room import Room
+
+
+SIZE = 3
+EMPTY, CROSS, NOUGHT = " ", "X", "O"
+ITERATIONS = 200_000
+GAMES = 20_000
+
+
+def list_wins(player: str, board: list[list[str]]) -> bool:
+    return (
+        any(all(board[y][x] == player for y in range(SIZE)) for x in range(SIZE))
+        or any(all(board[x][y] == player for y in range(SIZE)) for x in range(SIZE))
+        or all(board[y][y] == player for y in range(SIZE))
+        or all(board[SIZE - 1 - y][y] == player for y in range(SIZE))
+    )
+
+
+def list_draw(board: list[list[str]]) -> bool:
+    return all(board[y][x] != EMPTY for y in range(SIZE) for x in range(SIZE))
+
+
+def list_status(board: list[list[str]]) -> str:
+    res = ""
+    for y in range(SIZE):
+        for x in range(SIZE):
+            if board[x][y] == EMPTY:
+                res += "0"
+            elif board[x][y] == CROSS:
+                res += "1"
+            elif board[x][y] == NOUGHT:
+                res += "2"
+    return res
+
+
+class ListRoom:
+    """The board and game end check Room used before the bitboard"""
+    def __init__(self) -> None:
+        self.cross_turn = True
+        self.board = [[EMPTY] * SIZE for _ in range(SIZE)]
+
+    def is_valid_move(self, x: int, y: int) -> bool:
+        return self.board[x][y] == EMPTY
+
+    def make_move(self, x: int, y: int) -> None:
+        self.board[x][y] = CROSS if self.cross_turn else NOUGHT
+
+    def check_for_game_end(self) -> int:
+        if list_wins(CROSS if self.cross_turn else NOUGHT, self.board):
+            return 1
+        if list_draw(self.board):
+            return 2
+        return 0
+
+    def get_board_status(self) -> str:
+        return list_status(self.board)
+
+
+def to_bits(board: list[list[str]], value: str) -> int:
+    return sum(
+            bitboard.cell(x, y)
+            for x in range(SIZE) for y in range(SIZE)
+            if board[x][y] == value
+            )
+
+
+def check_agreement() -> None:
+    for cells in itertools.product([EMPTY, CROSS, NOUGHT], repeat = SIZE * SIZE):
+        board = [list(cells[i * SIZE:(i + 1) * SIZE]) for i in range(SIZE)]
+        crosses, noughts = to_bits(board, CROSS), to_bits(board, NOUGHT)
+
+        assert list_wins(CROSS, board) == bitboard.wins(crosses)
+        assert list_wins(NOUGHT, board) == bitboard.wins(noughts)
+        assert list_draw(board) == bitboard.is_full(crosses, noughts)
+        assert list_status(board) == bitboard.status(crosses, noughts)
+
+
+def time_ns(fn, args: list) -> float:
+    """Returns mean nanoseconds per call of fn over args"""
+    start = time.perf_counter_ns()
+    for arg in args:
+        fn(*arg)
+    return (time.perf_counter_ns() - start) / len(args)
+
+
+def play(make_room, moves: list[list[tuple[int, int]]]) -> None:
+    for game in moves:
+        room = make_room()
+        for x, y in game:
+            if not room.is_valid_move(x, y):
+                continue
+            room.make_move(x, y)
+            if room.check_for_game_end():
+                break
+            room.cross_turn = not room.cross_turn
+            room.get_board_status()
+
+
+def main() -> None:
+    check_agreement()
+    print("engines agree on all 3^9 boards")
+
+    rng = random.Random(0)
+    boards = []
+    for _ in range(ITERATIONS):
+        cells = rng.choices([EMPTY, CROSS, NOUGHT], k = SIZE * SIZE)
+        boards.append([cells[i * SIZE:(i + 1) * SIZE] for i in range(SIZE)])
+    bits = [(to_bits(board, CROSS), to_bits(board, NOUGHT)) for board in boards]
+
+    cases = [
+        ("win check", list_wins, [(CROSS, b) for b in boards],
+            bitboard.wins, [(c,) for c, _ in bits]),
+        ("draw check", list_draw, [(b,) for b in boards],
+            bitboard.is_full, bits),
+        ("board status", list_status, [(b,) for b in boards],
+            bitboard.status, bits),
+    ]
+
+    print(f"{'':<14} {'list':>10} {'bitboard':>10}")
+    for name, list_fn, list_args, bit_fn, bit_args in cases:
+        print(
+            f"{name:<14} {time_ns(list_fn, list_args):>7.0f} ns"
+            f" {time_ns(bit_fn, bit_args):>7.0f} ns"
+            )
+
+    cells = [(x, y) for x in range(SIZE) for y in range(SIZE)]
+    moves = [rng.sample(cells, len(cells)) for _ in range(GAMES)]
+
+    results = []
+    for make_room in [ListRoom, lambda: Room("bench")]:
+        start = time.perf_counter()
+        play(make_room, moves)
+        results.append((time.perf_counter() - start) / GAMES * 1e6)
+
+    print(f"{'whole game':<14} {results[0]:>7.1f} us {results[1]:>7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Measures the cost of finding an account during LOGIN as the number of
+accounts grows. bcrypt is left out by checking passwords with an executor
+that returns immediately, so only the account lookup is timed.
+
+    python benchmarks/bench_logins.py
+"""
+import os
+import sys
+import time
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logins import Logins
+
+
+ACCOUNT_COUNTS = [1_000, 10_000, 100_000, 1_000_000, 2_000_000]
+LOGINS_PER_RUN = 10_000
+
+
+class InstantAuth:
+    def check_password(self, password: str, hash: str) -> Future:
+        future = Future()
+        future.set_result(True)
+        return future
+
+
+def bench(n_accounts: int) -> float:
+    """Returns mean microseconds per login"""
+    logins = Logins()
+    for i in range(n_accounts):
+        logins.add_account(f"user{i}", "hash")
+
+    auth = InstantAuth()
+    # spread over the whole store, including the last account added
+    names = [f"user{(i * 7919) % n_accounts}" for i in range(LOGINS_PER_RUN)]
+    names[-1] = f"user{n_accounts - 1}"
+
+    start = time.perf_counter()
+    for name in names:
+        account = logins.try_login(name, "password", auth).result()
+        account.logout()
+    elapsed = time.perf_counter() - start
+
+    return elapsed / LOGINS_PER_RUN * 1e6
+
+
+def main() -> None:
+    print(f"{'accounts':>10}  {'us/login':>9}")
+    for n in ACCOUNT_COUNTS:
+        print(f"{n:>10}  {bench(n):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
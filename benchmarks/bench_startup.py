@@ -0,0 +1,91 @@
+"""
+Compares how long it takes, and how much memory is used, to get a user
+database ready for logins: loading every account up front, building the
+lazy index the first time, and opening the saved index afterwards. Each
+measurement runs in a fresh process so resident memory is not shared.
+
+    python benchmarks/bench_startup.py [user counts...]
+"""
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logins import Logins
+from userstore import JsonUserStore
+
+
+DEFAULT_COUNTS = [10_000, 1_000_000, 5_000_000]
+# the length of a bcrypt hash
+FAKE_HASH = "$2b$12$" + "x" * 53
+
+
+def write_users(path: str, n: int) -> None:
+    """Writes n accounts in the same layout json.dump(indent = 4) gives"""
+    with open(path, "w") as f:
+        f.write("[\n")
+        for i in range(n):
+            sep = ",\n" if i < n - 1 else "\n"
+            f.write(
+                    f'    {{\n        "username": "user{i}",\n'
+                    f'        "password": "{FAKE_HASH}"\n    }}{sep}'
+                    )
+        f.write("]")
+
+
+def child(mode: str, path: str) -> None:
+    start = time.perf_counter()
+    logins = Logins()
+    store = JsonUserStore(path)
+
+    if mode == "eager":
+        for username, hash in store.load():
+            logins.add_account(username, hash)
+    else:
+        store.index()
+        logins.source = store
+
+    elapsed = time.perf_counter() - start
+    assert logins.account_exists("user0")
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"seconds": elapsed, "rss_mb": rss_mb}))
+
+
+def measure(mode: str, path: str) -> dict:
+    out = subprocess.run(
+            [sys.executable, __file__, "--child", mode, path],
+            check = True, capture_output = True, text = True
+            ).stdout
+    return json.loads(out)
+
+
+def main(args: list[str]) -> None:
+    if args and args[0] == "--child":
+        child(args[1], args[2])
+        return
+
+    counts = [int(arg) for arg in args] or DEFAULT_COUNTS
+
+    print(f"{'users':>9}  {'mode':<11} {'seconds':>8}  {'peak rss MB':>11}")
+    for n in counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.json")
+            write_users(path, n)
+
+            # lazy-cold builds the index that lazy-warm then opens
+            for mode in ["eager", "lazy-cold", "lazy-warm"]:
+                result = measure(mode.split("-")[0], path)
+                print(
+                        f"{n:>9}  {mode:<11} {result['seconds']:>8.3f}"
+                        f"  {result['rss_mb']:>11.1f}"
+                        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
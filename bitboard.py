@@ -0,0 +1,102 @@
+__all__ = [
+    "SIZE",
+    "FULL",
+    "WIN_MASKS",
+    "cell",
+    "wins",
+    "is_full",
+    "status"
+]
+
+
+SIZE = 3
+# every cell occupied
+FULL = (1 << SIZE * SIZE) - 1
+
+#############################################################
+############### Private functions—do not use! ###############
+#############################################################
+
+def _line(cells) -> int:
+    mask = 0
+    for x, y in cells:
+        mask |= 1 << (y * SIZE + x)
+    return mask
+
+
+def _win_masks() -> tuple[int, ...]:
+    rows = [_line((x, y) for x in range(SIZE)) for y in range(SIZE)]
+    columns = [_line((x, y) for y in range(SIZE)) for x in range(SIZE)]
+    diagonals = [
+        _line((i, i) for i in range(SIZE)),
+        _line((SIZE - 1 - i, i) for i in range(SIZE))
+    ]
+    return tuple(rows + columns + diagonals)
+
+
+WIN_MASKS = _win_masks()
+
+# whether each possible set of one player's cells contains a winning line
+_WINNING = tuple(
+    any(bits & mask == mask for mask in WIN_MASKS) for bits in range(FULL + 1)
+)
+
+
+def _status_table() -> dict[int, str]:
+    """
+    Status string for every board with no cell taken by both players, keyed
+    by (crosses << 9) | noughts
+    """
+    # built up a row at a time from the boards of one less row
+    table = {0: ""}
+    for _ in range(SIZE):
+        rows = _row_statuses()
+        table = {
+            (((crosses << SIZE) | row_crosses) << SIZE * SIZE)
+                | (noughts << SIZE) | row_noughts: row + status
+            for key, status in table.items()
+            for crosses, noughts in [divmod(key, 1 << SIZE * SIZE)]
+            for (row_crosses, row_noughts), row in rows.items()
+        }
+    return table
+
+
+def _row_statuses() -> dict[tuple[int, int], str]:
+    rows = {}
+    for crosses in range(1 << SIZE):
+        for noughts in range(1 << SIZE):
+            if crosses & noughts == 0:
+                rows[(crosses, noughts)] = "".join(
+                    "1" if crosses >> i & 1 else "2" if noughts >> i & 1 else "0"
+                    for i in range(SIZE)
+                )
+    return rows
+
+
+_STATUS = _status_table()
+
+##########################################################
+############### Public functions—use these ###############
+##########################################################
+
+def cell(x: int, y: int) -> int:
+    """The bit for the cell in column x and row y"""
+    return 1 << (y * SIZE + x)
+
+
+def wins(bits: int) -> bool:
+    """Determines whether a player holding the cells in bits has won"""
+    return _WINNING[bits]
+
+
+def is_full(crosses: int, noughts: int) -> bool:
+    """Determines whether every cell is taken"""
+    return crosses | noughts == FULL
+
+
+def status(crosses: int, noughts: int) -> str:
+    """
+    The board as sent in BOARDSTATUS, a digit per cell, row by row, where
+    0 is empty, 1 is a cross and 2 is a nought
+    """
+    return _STATUS[(crosses << SIZE * SIZE) | noughts]
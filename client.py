@@ -2,26 +2,49 @@ import sys
 import os
 import socket
 import game
+import variant
+from codec import FrameDecoder, encode_frame
 from threading import Thread
 from queue import Queue
 
+ROOMLIST_PAGE_SIZE = 50
+
 class Client:
     def __init__(self, host: str, port: int) -> None:
         self.socket = socket.socket()
         self.socket.connect((host, port))
         self.in_game = False
         self.username = None
+        # lets a dropped connection RESUME its login
+        self.session_token = None
+        # seq of the last MOVE seen as a viewer, and whether a RESYNC has been
+        # sent that hasn't been answered
+        self.view_seq = 0
+        self.resyncing = False
         self.responses = Queue()
 
         Thread(target = self.talk_to_server).start()
         self.listen_to_server()
 
+    def send(self, msg: str) -> None:
+        self.socket.sendall(encode_frame(msg.encode()))
+
     def listen_to_server(self) -> None:
+        decoder = FrameDecoder()
+
         while True:
-            responses = self.socket.recv(8192).decode().split("\n")
+            responses = decoder.read_from(self.socket)
+
+            if responses is None:
+                return
+
             print(responses)
 
             for response in responses:
+                if response.startswith("SESSION:"):
+                    self.session_token = response.split(":")[1]
+                    continue
+
                 if response.startswith("BEGIN"):
                     self.in_game = True
                     Thread(
@@ -45,7 +68,7 @@ class Client:
                     os.system("clear")
                 # delete for submission
                 case "exit":
-                    self.socket.send("QUIT".encode())
+                    self.send("QUIT")
                     os._exit(0)
 
                 case "help":
@@ -74,7 +97,7 @@ class Client:
 
         username, password = info
 
-        self.socket.send(f"LOGIN:{username}:{password}".encode())
+        self.send(f"LOGIN:{username}:{password}")
 
         received = self.responses.get()
 
@@ -90,6 +113,8 @@ class Client:
                 print(f"Error: User {username} not found")
             case 2:
                 print(f"Error: Wrong password for user {username}")
+            case 4:
+                print("Error: Server is busy, please try again")
 
     def check_for_badauth(self, response: str) -> bool:
         if response == "BADAUTH":
@@ -106,24 +131,50 @@ class Client:
         elif mode == "v":
             mode = "VIEWER"
 
-        self.socket.send(f"ROOMLIST:{mode}".encode())
+        rooms = []
+        cursor = ""
 
-        response = self.responses.get()
+        # fetched a page at a time so no single reply grows too large
+        while True:
+            self.send(f"ROOMLIST:{mode}:{ROOMLIST_PAGE_SIZE}:{cursor}:")
 
-        if response == "ROOMLIST:ACKSTATUS:1":
-            sys.stderr.write("ClientError: Please input a valid mode")
-            return
+            response = self.responses.get()
 
-        if self.check_for_badauth(response):
-            return
-        
-        roomlist = response.split(":")[-1]
+            if response == "ROOMLIST:ACKSTATUS:1":
+                sys.stderr.write("ClientError: Please input a valid mode")
+                return
+
+            if self.check_for_badauth(response):
+                return
+
+            page, cursor = response.split(":")[3:]
+            if page:
+                rooms.append(page)
+
+            if not cursor:
+                break
+
+        roomlist = ",".join(rooms)
 
         print(f"Rooms available to join as {mode.lower()}: {roomlist}")
 
     def create_room(self) -> None:
         room_name = input("Please enter a name for your room: ")
-        self.socket.send(f"CREATE:{room_name}".encode())
+
+        if input("Play against the server? [y/n] ") == "y":
+            self.send(f"CREATE:{room_name}:BOT")
+
+        elif (
+                size := input(
+                    f"Board size, {variant.MIN_SIZE} to {variant.MAX_SIZE}"
+                    f" [{game.BOARD_SIZE}]: "
+                    )
+                ) and size != str(game.BOARD_SIZE):
+            k = input("How many in a row to win? ")
+            self.send(f"CREATE:{room_name}:{size}:{k}")
+
+        else:
+            self.send(f"CREATE:{room_name}")
 
         response = self.responses.get()
 
@@ -143,7 +194,9 @@ class Client:
             case 2:
                 print(f"Error: Room {room_name} already exists")
             case 3:
-                print("Error: Server already contains a maxumum of 256 rooms")
+                print("Error: Server already contains the maximum number of rooms")
+            case 4:
+                print("Error: Invalid board size or number in a row")
             case _:
                 raise Exception(f"Invalid return code {code}")
 
@@ -159,7 +212,7 @@ class Client:
             sys.stderr.write("Invalid room mode, please use 'p' or 'v'.\n")
             return
 
-        self.socket.send(f"JOIN:{room_name}:{mode}".encode())
+        self.send(f"JOIN:{room_name}:{mode}")
 
         response = self.responses.get()
         
@@ -187,17 +240,22 @@ class Client:
                 )
         # GAME:0 -> not started
         # GAME:1 -> started
+        # GAME:2 -> in progress, joined as a viewer
 
-        if not game_started:
-            return
+        if game_started == 2:
+            self.handle_game_in_progress(self.responses.get())
 
     def handle_game_start(self, data: str) -> None:
-        crosses, noughts = data.split(":")[1:]
+        # larger rooms also send their board size and number in a row
+        crosses, noughts, *board = data.split(":")[1:]
+        size = int(board[0]) if board else game.BOARD_SIZE
 
         is_player = self.username in (crosses, noughts)
         crosses_turn = True
+        self.view_seq = 0
+        self.resyncing = False
 
-        board_status = "000000000"
+        board_status = "0" * size * size
         while True:
             game.print_board_from_status(board_status)
             move = None
@@ -220,12 +278,16 @@ class Client:
                 print(msg)
 
             if move and move.lower() == "forfeit":
-                self.socket.send("FORFEIT".encode())
+                self.send("FORFEIT")
 
             elif move:
                 def valid_move(x, y):
-                    pos = 3 * y + x
-                    return 0 <= x <= 2 and 0 <= y <= 2 and board_status[pos] == "0"
+                    pos = size * y + x
+                    return (
+                            0 <= x < size
+                            and 0 <= y < size
+                            and board_status[pos] == "0"
+                            )
 
                 try:
                     x, y = map(lambda x : int(x), move.split())
@@ -235,7 +297,7 @@ class Client:
 
                 while not valid_move(x, y):
                     print("Sorry, that was an invalid move, please try again")
-                    print("0 <= x, y <= 2")
+                    print(f"0 <= x, y <= {size - 1}")
                     move = input("Enter a valid coordinate in the form [x y] ")
 
                     try:
@@ -244,7 +306,7 @@ class Client:
                         x, y = -1, -1
 
                 print("sending place")
-                self.socket.send(f"PLACE:{x}:{y}".encode())
+                self.send(f"PLACE:{x}:{y}")
 
             data = self.responses.get()
 
@@ -252,7 +314,11 @@ class Client:
                 self.handle_game_end(data.split(":")[1:], is_player)
                 return
 
-            board_status = data.split(":")[1]
+            if not is_player:
+                board_status = self.spectate(data, board_status)
+                continue
+
+            board_status = variant.unpack_status(data.split(":")[1])
             crosses_turn = not crosses_turn
 
     def handle_game_in_progress(self, data: str) -> None:
@@ -260,7 +326,9 @@ class Client:
         msg = f"Match between {args[0]} and {args[1]} is currently in"
         msg += f" progress, it is {args[0]}'s turn"
         print(msg)
-        board_status = "000000000"
+        # replaced by the SNAPSHOT sent after INPROGRESS
+        board_status = ""
+        self.resyncing = True
         while True:
             data = self.responses.get()
 
@@ -268,8 +336,40 @@ class Client:
                 self.handle_game_end(data.split(":")[1:], False)
                 return
 
-            board_status = data.split(":")[1]
-            game.print_board_from_status(board_status)
+            board_status = self.spectate(data, board_status)
+
+            if board_status:
+                game.print_board_from_status(board_status)
+
+    def spectate(self, data: str, board_status: str) -> str:
+        """
+        Applies a SNAPSHOT or MOVE sent to viewers to board_status. A MOVE
+        that skips ahead means one was missed, so the whole board is asked
+        for again and moves are ignored until it arrives
+        """
+        args = data.split(":")[1:]
+
+        if data.startswith("SNAPSHOT:"):
+            self.view_seq = int(args[0])
+            self.resyncing = False
+            return variant.unpack_status(args[1])
+
+        if not data.startswith("MOVE:") or self.resyncing:
+            return board_status
+
+        cell, mark, seq = map(int, args)
+
+        # already part of a snapshot
+        if seq <= self.view_seq:
+            return board_status
+
+        if seq != self.view_seq + 1:
+            self.resyncing = True
+            self.send("RESYNC")
+            return board_status
+
+        self.view_seq = seq
+        return board_status[:cell] + str(mark) + board_status[cell + 1:]
     
     def handle_game_end(self, args: list[str], is_player: bool) -> None:
         code = int(args[1])
@@ -304,7 +404,7 @@ class Client:
 
         username, password = info
 
-        self.socket.send(f"REGISTER:{username}:{password}".encode())
+        self.send(f"REGISTER:{username}:{password}")
 
         response = self.responses.get()
 
@@ -318,6 +418,8 @@ class Client:
                 print(f"Successfully created user account {username}")
             case 1:
                 print(f"Error: User {username} already exists")
+            case 3:
+                print("Error: Server is busy, please try again")
 
     def get_info(self) -> tuple[str, str] | None:
         username = input("Enter username: ")
@@ -0,0 +1,140 @@
+import socket
+
+__all__ = [
+    "MAX_FRAME_LENGTH",
+    "FrameTooLong",
+    "FrameDecoder",
+    "encode_frame",
+    "send_frames",
+    "skip_sent"
+]
+
+
+DELIMITER = b"\n"
+MAX_FRAME_LENGTH = 8192
+# most buffers a single sendmsg call accepts on Linux
+IOV_MAX = 1024
+
+
+class FrameTooLong(Exception):
+    pass
+
+
+def encode_frame(msg: bytes) -> bytes:
+    """Terminates a message so it can be sent as a single frame"""
+    return msg + DELIMITER
+
+
+def send_frames(sock: socket.socket, frames: list[bytes]) -> None:
+    """
+    Sends every frame with vectored writes, without joining them into a new
+    buffer first. Blocks until everything has been sent, like sendall
+    """
+    while frames:
+        frames = skip_sent(frames, sock.sendmsg(frames[:IOV_MAX]))
+
+
+def skip_sent(frames: list[bytes], sent: int) -> list[bytes]:
+    """
+    Returns what is left of frames after the first sent bytes have been
+    written, which may end part way through a frame
+    """
+    i = 0
+    while i < len(frames) and sent >= len(frames[i]):
+        sent -= len(frames[i])
+        i += 1
+
+    frames = frames[i:]
+    if sent:
+        frames[0] = memoryview(frames[0])[sent:]
+
+    return frames
+
+
+class FrameDecoder:
+    """
+    Incremental parser for newline terminated frames. Reads go straight into a
+    fixed size buffer that is reused for the whole connection, so a read may
+    contain any number of frames, or only part of one
+    """
+    def __init__(self, max_length: int = MAX_FRAME_LENGTH) -> None:
+        self.max_length = max_length
+
+        # room for a maximum length frame and its delimiter, plus a full
+        # frame's worth of new data behind it
+        self._buffer = bytearray(2 * (max_length + len(DELIMITER)))
+        self._view = memoryview(self._buffer)
+
+        # unparsed data lives in self._buffer[self._start:self._end]
+        self._start = 0
+        self._end = 0
+        # bytes received over the whole connection
+        self.received = 0
+
+    def free_space(self) -> memoryview:
+        """
+        Returns the writable part of the buffer, moving any partial frame to
+        the front first
+        """
+        if self._start:
+            pending = self._end - self._start
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._start, self._end = 0, pending
+
+        return self._view[self._end:]
+
+    def commit(self, n: int) -> list[str]:
+        """
+        Marks n bytes written into free_space() as received and returns every
+        frame that is now complete
+        """
+        self._end += n
+        self.received += n
+        frames = []
+
+        while (i := self._buffer.find(DELIMITER, self._start, self._end)) != -1:
+            if i - self._start > self.max_length:
+                raise FrameTooLong(f"Frame longer than {self.max_length} bytes")
+
+            frame = str(self._view[self._start:i], "utf-8", "replace")
+            self._start = i + len(DELIMITER)
+
+            if frame:
+                frames.append(frame)
+
+        if self._end - self._start > self.max_length:
+            raise FrameTooLong(f"Frame longer than {self.max_length} bytes")
+
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        return frames
+
+    def feed(self, data: bytes) -> list[str]:
+        """
+        Copies data that has already been read into the buffer and returns
+        every frame that is now complete
+        """
+        frames = []
+        data = memoryview(data)
+
+        while data:
+            space = self.free_space()
+            n = min(len(space), len(data))
+            space[:n] = data[:n]
+            frames.extend(self.commit(n))
+            data = data[n:]
+
+        return frames
+
+    def read_from(self, sock: socket.socket) -> list[str] | None:
+        """
+        Receives directly into the buffer. Returns None once the other end has
+        closed the connection
+        """
+        n = sock.recv_into(self.free_space())
+
+        if not n:
+            return None
+
+        return self.commit(n)
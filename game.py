@@ -1,3 +1,5 @@
+import math
+import bitboard
 from typing import Optional
 
 
@@ -31,25 +33,14 @@ Board = list[list[str]]
 ############### Private functions—do not use! ###############
 #############################################################
 
-def _player_wins_vertically(player: str, board: Board) -> bool:
-    return any(
-        all(board[y][x] == player for y in range(BOARD_SIZE)) 
-        for x in range(BOARD_SIZE)
-    )
-
-
-def _player_wins_horizontally(player: str, board: Board) -> bool:
-    return any(
-        all(board[x][y] == player for y in range(BOARD_SIZE)) 
-        for x in range(BOARD_SIZE)
-    )
-
-
-def _player_wins_diagonally(player: str, board: Board) -> bool:
-    return (
-        all(board[y][y] == player for y in range(BOARD_SIZE)) or
-        all(board[BOARD_SIZE - 1 - y][y] == player for y in range(BOARD_SIZE))
-    )
+def _cells(value: str, board: Board) -> int:
+    """The cells holding value, as a bitboard"""
+    bits = 0
+    for y in range(BOARD_SIZE):
+        for x in range(BOARD_SIZE):
+            if board[y][x] == value:
+                bits |= bitboard.cell(x, y)
+    return bits
 
 
 def _try_read_value(prompt: str) -> Optional[int]:
@@ -85,19 +76,22 @@ def create_board() -> Board:
 
 def print_board(board: Board):
     """Print the board"""
-    print(ROW_SEPARATOR * N_ROW_SEPARATORS)
+    n_row_separators = CELL_SIZE + (CELL_SIZE - 1) * (len(board) - 1)
+    print(ROW_SEPARATOR * n_row_separators)
     for row in board:
         for value in row:
             print(f"{COLUMN_SEPARATOR} {value} ", end='')
         print(COLUMN_SEPARATOR)
-        print(ROW_SEPARATOR * N_ROW_SEPARATORS)
+        print(ROW_SEPARATOR * n_row_separators)
 
 def print_board_from_status(status: str) -> None:
+    """Print a board sent as a digit per cell, of any square size"""
+    size = math.isqrt(len(status))
     board = []
-    for y in range(3):
+    for y in range(size):
         row = []
-        for x in range(3):
-            pos = y * 3 + x
+        for x in range(size):
+            pos = y * size + x
             if status[pos] == "0":
                 row.append(EMPTY)
             elif status[pos] == "1":
@@ -116,17 +110,9 @@ def player_turn(player: str, board: Board) -> tuple[int, int]:
 
 def player_wins(player: str, board: Board) -> bool:
     """Determines whether the specified player wins given the board"""
-    return (
-        _player_wins_vertically(player, board) or
-        _player_wins_horizontally(player, board) or
-        _player_wins_diagonally(player, board)
-    )
+    return bitboard.wins(_cells(player, board))
 
 
 def players_draw(board: Board) -> bool:
     """Determines whether the players draw on the given board"""
-    return all(
-        board[y][x] != EMPTY 
-        for y in range(BOARD_SIZE) 
-        for x in range(BOARD_SIZE)
-    )
+    return _cells(EMPTY, board) == 0
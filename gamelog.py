@@ -0,0 +1,240 @@
+import os
+import re
+import mmap
+import time
+import struct
+import itertools
+from queue import Queue, Empty
+from threading import Thread
+
+__all__ = [
+    "BEGIN",
+    "PLACE",
+    "GAMEEND",
+    "NO_WINNER",
+    "GameLog",
+    "segment_paths",
+    "segment_run",
+    "read_events"
+]
+
+
+MAGIC = b"GLOG0001"
+# magic, and the id of the server run that wrote the segment. Game ids are
+# only unique within a run
+SEGMENT_HEADER = struct.Struct("<8sQ")
+
+BEGIN = 1
+PLACE = 2
+GAMEEND = 3
+
+# every record starts with its type and game id
+# board size, number in a row to win, then the lengths of the UTF-8 room and
+# player names that follow
+BEGIN_RECORD = struct.Struct("<BIBBBBB")
+# cell as y * size + x, and the mark placed there, 1 for a cross, 2 for a
+# nought
+PLACE_RECORD = struct.Struct("<BIHB")
+# GAMEEND code as sent to clients, 0 won, 1 draw, 2 forfeit, then the index
+# of the winner in BEGIN's players
+GAMEEND_RECORD = struct.Struct("<BIBB")
+NO_WINNER = 255
+
+SEGMENT_NAME = re.compile(r"games-(\d{8})\.log")
+
+
+def segment_paths(directory: str) -> list[str]:
+    """
+    Segments in directory, oldest first
+    """
+    names = sorted(
+            name for name in os.listdir(directory) if SEGMENT_NAME.fullmatch(name)
+            )
+    return [os.path.join(directory, name) for name in names]
+
+
+def _name(name: str) -> bytes:
+    # lengths are stored in a byte
+    return name.encode()[:255]
+
+
+class GameLog:
+    """
+    Append only binary log of every game's BEGIN, PLACE and GAMEEND events,
+    written as segments of about segment_bytes each in directory.
+
+    Like UserStore, records are queued and written by a single background
+    thread, which writes everything queued since its last write in one go,
+    so recording an event never waits on the disk. Records still queued
+    when the process dies are lost, and a record torn by a crash is ignored
+    by read_events
+    """
+    def __init__(
+            self, directory: str, segment_bytes: int = 64 * 1024 * 1024
+            ) -> None:
+        os.makedirs(directory, exist_ok = True)
+
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.run = time.time_ns()
+
+        self._games = itertools.count(1)
+        self._queue: Queue[bytes | None] = Queue()
+        self._file = None
+        self._size = 0
+
+        paths = segment_paths(directory)
+        self._segment = (
+                int(SEGMENT_NAME.fullmatch(os.path.basename(paths[-1])).group(1))
+                if paths else 0
+                )
+
+        self._writer = Thread(target = self._write_batches, daemon = True)
+        self._writer.start()
+
+    def begin(
+            self, room: str, players: list[str], size: int, k: int
+            ) -> int:
+        """
+        Returns the id to record the rest of the game's events under
+        """
+        game = next(self._games)
+        room_name, crosses, noughts = _name(room), *map(_name, players)
+
+        self._queue.put(
+                BEGIN_RECORD.pack(
+                    BEGIN, game, size, k,
+                    len(room_name), len(crosses), len(noughts)
+                    )
+                + room_name + crosses + noughts
+                )
+        return game
+
+    def place(self, game: int, cell: int, mark: int) -> None:
+        self._queue.put(PLACE_RECORD.pack(PLACE, game, cell, mark))
+
+    def end(self, game: int, code: int, winner: int = NO_WINNER) -> None:
+        self._queue.put(GAMEEND_RECORD.pack(GAMEEND, game, code, winner))
+
+    def close(self) -> None:
+        """
+        Writes everything queued so far and stops the writer
+        """
+        self._queue.put(None)
+        self._writer.join()
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+        self._segment += 1
+        path = os.path.join(self.directory, f"games-{self._segment:08d}.log")
+
+        self._file = open(path, "ab")
+        self._file.write(SEGMENT_HEADER.pack(MAGIC, self.run))
+        self._size = SEGMENT_HEADER.size
+
+    def _write_batches(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except Empty:
+                pass
+
+            stopping = None in batch
+            data = b"".join(record for record in batch if record is not None)
+
+            if data:
+                if self._file is None or self._size >= self.segment_bytes:
+                    self._rotate()
+
+                self._file.write(data)
+                self._file.flush()
+                self._size += len(data)
+
+            if stopping:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+
+def segment_run(path: str) -> int:
+    """
+    The id of the server run that wrote a segment
+    """
+    with open(path, "rb") as f:
+        header = f.read(SEGMENT_HEADER.size)
+
+    if len(header) < SEGMENT_HEADER.size:
+        raise ValueError(f"{path} is not a game log segment")
+
+    magic, run = SEGMENT_HEADER.unpack(header)
+
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a game log segment")
+
+    return run
+
+
+def read_events(path: str):
+    """
+    Yields every complete record in a segment as a tuple starting with its
+    type and game id, followed by (cell, mark) for PLACE, (code, winner) for
+    GAMEEND and (room, crosses, noughts, size, k) for BEGIN
+    """
+    segment_run(path)
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as data:
+            yield from _records(data)
+
+
+def _records(data):
+    # records are yielded straight from unpack_from, as replaying a log is
+    # bound by the work done per record
+    unpack_place = PLACE_RECORD.unpack_from
+    unpack_end = GAMEEND_RECORD.unpack_from
+    unpack_begin = BEGIN_RECORD.unpack_from
+    place_size, end_size = PLACE_RECORD.size, GAMEEND_RECORD.size
+    begin_size = BEGIN_RECORD.size
+
+    end = len(data)
+    i = SEGMENT_HEADER.size
+
+    while i < end:
+        kind = data[i]
+
+        if kind == PLACE:
+            if i + place_size > end:
+                return
+            yield unpack_place(data, i)
+            i += place_size
+
+        elif kind == GAMEEND:
+            if i + end_size > end:
+                return
+            yield unpack_end(data, i)
+            i += end_size
+
+        elif kind == BEGIN:
+            if i + begin_size > end:
+                return
+            _, game, size, k, *lengths = unpack_begin(data, i)
+            i += begin_size
+
+            if i + sum(lengths) > end:
+                return
+
+            names = []
+            for length in lengths:
+                names.append(str(data[i:i + length], "utf-8", "replace"))
+                i += length
+
+            yield (BEGIN, game, *names, size, k)
+
+        else:
+            # torn or corrupt from here on
+            return
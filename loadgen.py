@@ -0,0 +1,521 @@
+import os
+import sys
+import math
+import time
+import random
+import asyncio
+import resource
+import itertools
+from game import BOARD_SIZE
+from codec import encode_frame
+
+__all__ = [
+    "SCENARIOS",
+    "Results",
+    "Connection",
+    "run"
+]
+
+
+HOST = "127.0.0.1"
+# seconds to wait for a reply before counting it as an error
+REPLY_TIMEOUT = 30
+# new connections opened per second while setting up, so the server's listen
+# backlog isn't overrun
+CONNECT_RATE = 1000
+PERCENTILES = (50, 99, 99.9)
+
+
+class Results:
+    """
+    Latencies of every reply received and counts of every error, by command
+    """
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        # keyed by command and reason, eg. "LOGIN ACKSTATUS:4"
+        self.errors: dict[str, int] = {}
+
+    def record(self, command: str, seconds: float) -> None:
+        self.latencies.setdefault(command, []).append(seconds)
+
+    def error(self, command: str, reason: str) -> None:
+        key = f"{command} {reason}"
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    def report(self, elapsed: float) -> str:
+        lines = [
+            f"{'command':<10}{'count':>9}{'per s':>10}"
+            + "".join(f"{f'p{p:g} ms':>11}" for p in PERCENTILES)
+        ]
+
+        for command, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            lines.append(
+                    f"{command:<10}{len(latencies):>9}"
+                    f"{len(latencies) / elapsed:>10,.0f}"
+                    + "".join(
+                        f"{_percentile(latencies, p) * 1000:>11.2f}"
+                        for p in PERCENTILES
+                        )
+                    )
+
+        requests = sum(map(len, self.latencies.values()))
+        lines.append(
+                f"{requests} replies in {elapsed:.1f}s,"
+                f" {requests / elapsed:,.0f}/s,"
+                f" {sum(self.errors.values())} errors"
+                )
+
+        for key, count in sorted(self.errors.items()):
+            lines.append(f"  {key}: {count}")
+
+        return "\n".join(lines)
+
+
+def _percentile(values: list[float], p: float) -> float:
+    # nearest rank of a sorted list
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class Connection:
+    """
+    A headless client. Once a connection has timed out or been closed by the
+    server, failed is set and the scenario using it stops
+    """
+    def __init__(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+            results: Results
+            ) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.results = results
+        self.failed = False
+
+    @staticmethod
+    async def open(port: int, results: Results) -> "Connection | None":
+        started = time.perf_counter()
+
+        try:
+            reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(HOST, port), REPLY_TIMEOUT
+                    )
+        except TimeoutError:
+            results.error("CONNECT", "timeout")
+            return None
+        except OSError as e:
+            results.error("CONNECT", type(e).__name__)
+            return None
+
+        results.record("CONNECT", time.perf_counter() - started)
+        return Connection(reader, writer, results)
+
+    def send(self, msg: str) -> None:
+        self.writer.write(encode_frame(msg.encode()))
+
+    async def expect(self, command: str, *kinds: str) -> list[str] | None:
+        """
+        Reads until a frame of one of kinds arrives, skipping any others, and
+        returns its fields. Returns None if there is no such frame within
+        REPLY_TIMEOUT, counting it as an error for command
+        """
+        if self.failed:
+            return None
+
+        try:
+            while True:
+                line = await asyncio.wait_for(
+                        self.reader.readline(), REPLY_TIMEOUT
+                        )
+
+                if not line:
+                    raise ConnectionResetError
+
+                fields = line.decode().rstrip("\n").split(":")
+
+                if fields[0] in kinds or fields[0] == "BADAUTH":
+                    return fields
+
+        except TimeoutError:
+            self.results.error(command, "timeout")
+        except OSError:
+            self.results.error(command, "disconnected")
+
+        self.failed = True
+        return None
+
+    async def request(
+            self, command: str, msg: str, *kinds: str
+            ) -> list[str] | None:
+        """
+        Sends msg and waits for the reply, a frame starting with command or
+        one of kinds. Returns its fields, or None if it is an error
+        """
+        started = time.perf_counter()
+        self.send(msg)
+
+        if (fields := await self.expect(command, command, *kinds)) is None:
+            return None
+
+        self.results.record(command, time.perf_counter() - started)
+
+        if fields[0] == "BADAUTH":
+            self.results.error(command, "BADAUTH")
+            return None
+
+        if len(fields) > 2 and fields[1] == "ACKSTATUS" and fields[2] != "0":
+            self.results.error(command, f"ACKSTATUS:{fields[2]}")
+            return None
+
+        return fields
+
+    async def log_in(self, name: str) -> str | None:
+        """
+        Registers name and logs in as it, returns the session token
+        """
+        if (
+                await self.request("REGISTER", f"REGISTER:{name}:{name}") is None
+                or await self.request("LOGIN", f"LOGIN:{name}:{name}") is None
+                or (session := await self.expect("LOGIN", "SESSION")) is None
+                ):
+            return None
+
+        return session[1]
+
+    async def close(self) -> None:
+        self.writer.close()
+
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+
+
+class _Run:
+    """
+    What every connection in a run shares
+    """
+    def __init__(self, port: int, viewers: int) -> None:
+        self.port = port
+        self.viewers = viewers
+        self.deadline = 0.0
+        # names from earlier runs are still registered
+        self.prefix = f"lg{random.getrandbits(24):06x}"
+        self.results = Results()
+
+    def finished(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def name(self, i: int, n: int = 0) -> str:
+        # short enough to be a room name too
+        return f"{self.prefix}-{i}-{n}"
+
+
+class _Table:
+    """
+    The connections playing and watching one room after another. The host
+    creates each room and tells the others, through their queues, which room
+    to join
+    """
+    def __init__(self, viewers: int) -> None:
+        self.guest: asyncio.Queue[str | None] = asyncio.Queue()
+        self.viewer_rooms = [asyncio.Queue() for _ in range(viewers)]
+        self.viewers = viewers
+        # a viewer puts None once it has joined a room or stopped
+        self.joined: asyncio.Queue[None] = asyncio.Queue()
+        # when each cell was played in the current game, to time MOVEs
+        self.placed: dict[int, float] = {}
+
+    def stop(self) -> None:
+        for queue in [self.guest, *self.viewer_rooms]:
+            queue.put_nowait(None)
+
+#############################################################
+############### Private functions—do not use! ###############
+#############################################################
+
+async def _play(conn: Connection, name: str, table: _Table) -> None:
+    """
+    Plays random legal moves as name until the game ends. PLACE is timed
+    until the BOARDSTATUS or GAMEEND it causes
+    """
+    mark = None
+    sent = None
+
+    while (fields := await conn.expect(
+            "PLACE", "BEGIN", "BOARDSTATUS", "GAMEEND"
+            )) is not None:
+        if fields[0] == "BEGIN":
+            mark = "1" if fields[1] == name else "2"
+            board = "0" * BOARD_SIZE * BOARD_SIZE
+        else:
+            if sent is not None:
+                conn.results.record("PLACE", time.perf_counter() - sent)
+                sent = None
+
+            if fields[0] == "GAMEEND":
+                return
+
+            board = fields[1]
+
+        # crosses move when an odd number of cells are empty
+        turn = "1" if board.count("0") % 2 else "2"
+
+        if mark == turn:
+            cell = random.choice(
+                    [i for i, value in enumerate(board) if value == "0"]
+                    )
+            table.placed[cell] = sent = time.perf_counter()
+            conn.send(f"PLACE:{cell % BOARD_SIZE}:{cell // BOARD_SIZE}")
+
+
+async def _watch(conn: Connection, table: _Table) -> None:
+    """
+    Reads a game as a viewer until it ends. MOVE is timed from when the
+    player sent the PLACE it shows
+    """
+    while (fields := await conn.expect("MOVE", "MOVE", "GAMEEND")) is not None:
+        if fields[0] == "GAMEEND":
+            return
+
+        if (sent := table.placed.get(int(fields[1]))) is not None:
+            conn.results.record("MOVE", time.perf_counter() - sent)
+
+
+async def _host(
+        run: _Run, i: int, conn: Connection, name: str, table: _Table
+        ) -> None:
+    try:
+        for n in itertools.count():
+            if run.finished() or conn.failed:
+                return
+
+            room = run.name(i, n)
+
+            if (
+                    await conn.request("CREATE", f"CREATE:{room}") is None
+                    or await conn.request("JOIN", f"JOIN:{room}:PLAYER") is None
+                    ):
+                # eg. the server is full, so waits for rooms to be reclaimed
+                await asyncio.sleep(1)
+                continue
+
+            table.placed.clear()
+
+            for queue in table.viewer_rooms:
+                queue.put_nowait(room)
+
+            joined = 0
+            while joined < table.viewers:
+                await table.joined.get()
+                joined += 1
+
+            table.guest.put_nowait(room)
+            await _play(conn, name, table)
+    finally:
+        table.stop()
+
+
+async def _guest(conn: Connection, name: str, table: _Table) -> None:
+    while not conn.failed and (room := await table.guest.get()) is not None:
+        if await conn.request("JOIN", f"JOIN:{room}:PLAYER") is not None:
+            await _play(conn, name, table)
+
+
+async def _viewer(
+        conn: Connection, table: _Table, rooms: asyncio.Queue
+        ) -> None:
+    try:
+        while not conn.failed and (room := await rooms.get()) is not None:
+            joined = await conn.request("JOIN", f"JOIN:{room}:VIEWER")
+            table.joined.put_nowait(None)
+
+            if joined is not None:
+                await _watch(conn, table)
+    finally:
+        table.viewers -= 1
+        table.joined.put_nowait(None)
+
+
+async def _auth(run: _Run, i: int) -> None:
+    """
+    Registers and logs in as a new account on a new connection, over and
+    over
+    """
+    for n in itertools.count():
+        if run.finished():
+            return
+
+        if (conn := await Connection.open(run.port, run.results)) is None:
+            return
+
+        await conn.log_in(run.name(i, n))
+        await conn.close()
+
+
+async def _churn(run: _Run, i: int, conn: Connection, token: str) -> None:
+    """
+    Creates a room, joins it and lists the open rooms, then reconnects so
+    the room is reclaimed, resuming the login from its session token
+    """
+    for n in itertools.count():
+        if run.finished():
+            break
+
+        room = run.name(i, n)
+        await conn.request("CREATE", f"CREATE:{room}")
+        await conn.request("JOIN", f"JOIN:{room}:PLAYER")
+        await conn.request("ROOMLIST", "ROOMLIST:PLAYER:20::")
+        await conn.close()
+
+        if (conn := await Connection.open(run.port, run.results)) is None:
+            return
+
+        if (
+                await conn.request("RESUME", f"RESUME:{token}") is None
+                or (session := await conn.expect("RESUME", "SESSION")) is None
+                ):
+            break
+
+        token = session[1]
+
+    await conn.close()
+
+
+async def _connect(
+        run: _Run, i: int, results: Results
+        ) -> tuple[Connection, str, str] | None:
+    """
+    Opens connection i and logs it in as its own account
+    """
+    await asyncio.sleep(i / CONNECT_RATE)
+
+    if (conn := await Connection.open(run.port, results)) is None:
+        return None
+
+    if (token := await conn.log_in(run.name(i))) is None:
+        await conn.close()
+        return None
+
+    # the run's results are used from here on
+    conn.results = run.results
+    return conn, run.name(i), token
+
+
+async def _run_connected(run: _Run, scenario: str, connected: list) -> None:
+    if scenario == "churn":
+        await asyncio.gather(*(
+            _churn(run, i, conn, token)
+            for i, (conn, _, token) in enumerate(connected)
+        ))
+        return
+
+    # the host, the guest, then the viewers of each room
+    group = 2 + run.viewers
+    tasks = []
+
+    for start in range(0, len(connected) - group + 1, group):
+        table = _Table(run.viewers)
+        (host, host_name, _), (guest, guest_name, _), *viewers = (
+                connected[start:start + group]
+                )
+
+        tasks.append(_host(run, start, host, host_name, table))
+        tasks.append(_guest(guest, guest_name, table))
+        tasks.extend(
+                _viewer(conn, table, rooms)
+                for (conn, _, _), rooms in zip(viewers, table.viewer_rooms)
+                )
+
+    await asyncio.gather(*tasks)
+
+    for conn, _, _ in connected:
+        await conn.close()
+
+
+SCENARIOS = ["auth", "churn", "games", "viewers"]
+
+##########################################################
+############### Public functions—use these ###############
+##########################################################
+
+async def run(
+        port: int,
+        scenario: str,
+        connections: int,
+        seconds: float,
+        viewers: int = 0
+        ) -> tuple[Results, float, Results, float]:
+    """
+    Runs scenario on connections connections for about seconds seconds
+    against a server on port:
+        auth: a register/login storm, a new account per connection
+        churn: rooms created, joined, listed and reclaimed
+        games: pairs of players playing random legal moves
+        viewers: like games, with viewers watching each room
+
+    Except for auth, every connection first logs in as its own account.
+    Returns the results and seconds taken to set up the connections, then
+    the results and seconds taken by the scenario itself
+    """
+    current = _Run(port, viewers if scenario == "viewers" else 0)
+    setup = Results()
+    started = time.monotonic()
+
+    if scenario == "auth":
+        setup_elapsed = 0.0
+        current.deadline = started + seconds
+        await asyncio.gather(*(_auth(current, i) for i in range(connections)))
+    else:
+        connected = [
+            conn for conn in await asyncio.gather(
+                *(_connect(current, i, setup) for i in range(connections))
+                )
+            if conn is not None
+        ]
+        setup_elapsed = time.monotonic() - started
+
+        started = time.monotonic()
+        current.deadline = started + seconds
+        await _run_connected(current, scenario, connected)
+
+    return setup, setup_elapsed, current.results, time.monotonic() - started
+
+
+def main(args: list[str]) -> None:
+    if (
+            len(args) not in [4, 5]
+            or not all(arg.isdigit() for arg in args[:1] + args[2:])
+            or args[1] not in SCENARIOS
+            ):
+        sys.stderr.write(
+                "Usage: loadgen.py <port> <scenario> <connections> <seconds>"
+                " [viewers per room]\n"
+                f"Scenarios: {', '.join(SCENARIOS)}\n"
+                )
+        os._exit(1)
+
+    port, scenario = int(args[0]), args[1]
+    connections, seconds = int(args[2]), int(args[3])
+    viewers = int(args[4]) if len(args) > 4 else 20
+
+    # a file descriptor per connection
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    setup, setup_elapsed, results, elapsed = asyncio.run(
+            run(port, scenario, connections, seconds, viewers)
+            )
+
+    if setup_elapsed:
+        print(f"Setting up {connections} connections:")
+        print(setup.report(setup_elapsed))
+        print()
+
+    print(f"{scenario} on {connections} connections:")
+    print(results.report(elapsed))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
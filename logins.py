@@ -1,40 +1,41 @@
-import bcrypt
+from concurrent.futures import Future
+from threading import Lock
+from auth import AuthExecutor
+from userstore import UserStore
 
 class Login:
     def __init__(self, name: str, password: str) -> None:
         self.name = name
         self._password = password
         self._logged_in = False
+        # connection currently logged in as this account
+        self.owner = None
 
     def __str__(self) -> str:
         return f"Name: '{self.name}', Password: '{self._password}'"
     
-    def is_valid(self, name: str, password: str) -> int:
+    def check(self, password: str, auth: AuthExecutor) -> Future:
         """
-        returns 1 if valid, 0 if not, and -1 if account is valid but already
-        logged in
+        Returns a future resolving to True if password is correct
         """
-        if (
-                self.name == name
-                and bcrypt.checkpw(password.encode(), self._password.encode())
-                ):
-            if self._logged_in:
-                return -1
-
-            return 1
-
-        return 0
+        return auth.check_password(password, self._password)
 
     def logout(self) -> None:
         self._logged_in = False
+        self.owner = None
 
 class Logins:
     def __init__(self) -> None:
-        self.accounts: list[Login] = []
+        # keyed by username
+        self.accounts: dict[str, Login] = {}
+        # makes checking and setting _logged_in atomic across connections
+        self._login_lock = Lock()
+        # when set, accounts not in self.accounts are looked up here on demand
+        self.source: UserStore | None = None
 
     def __str__(self) -> str:
         res = ""
-        for acc in self.accounts:
+        for acc in self.accounts.values():
             res += str(acc) + ", "
         return res.rstrip(", ")
 
@@ -42,35 +43,74 @@ class Logins:
         """
         takes password as str hash
         """
-        self.accounts.append(Login(name, password))
+        # the first account with a name wins, as it did when scanning a list
+        self.accounts.setdefault(name, Login(name, password))
 
     def account_exists(self, name: str) -> bool:
         """
         returns wether or not a username has an associated account
         """
-        for account in self.accounts:
-            if account.name == name:
-                return True
+        return self.get_account(name) is not None
+
+    def get_account(self, name: str) -> Login | None:
+        account = self.accounts.get(name)
 
-        return False
+        if (
+                account is None
+                and self.source is not None
+                and (hash := self.source.get(name)) is not None
+                ):
+            account = self.accounts.setdefault(name, Login(name, hash))
+
+        return account
 
-    def try_login(self, name: str, password: str) -> Login | int:
+    def resume(self, name: str) -> Login | None:
         """
-        Returns a Login obj for a successful login, or 
+        Logs into an account from a resumed session without checking its
+        password, even if an old connection is still logged in as it
+        """
+        account = self.get_account(name)
+
+        if account is None:
+            return None
+
+        with self._login_lock:
+            account._logged_in = True
+
+        return account
+
+    def try_login(self, name: str, password: str, auth: AuthExecutor) -> Future:
+        """
+        Returns a future resolving to a Login obj for a successful login, or
         -1 -> Account already logged in
         1 -> Username Not found
         2 -> Only Username matches
+        Raises AuthQueueFull if the password can't be checked right now
         """
-        for account in self.accounts:
-            code = account.is_valid(name, password)
-            if code == 1:
+        result = Future()
+        account = self.get_account(name)
+
+        if account is None:
+            result.set_result(1)
+            return result
+
+        def finish(check: Future) -> None:
+            if (error := check.exception()) is not None:
+                result.set_exception(error)
+                return
+
+            if not check.result():
+                result.set_result(2)
+                return
+
+            with self._login_lock:
+                if account._logged_in:
+                    result.set_result(-1)
+                    return
+
                 account._logged_in = True
-                return account
 
-            if code == -1:
-                return -1
+            result.set_result(account)
 
-        if self.account_exists(name):
-            return 2
-        
-        return 1
+        account.check(password, auth).add_done_callback(finish)
+        return result
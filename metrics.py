@@ -0,0 +1,242 @@
+import weakref
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "Counter",
+    "Histogram",
+    "Registry",
+    "REGISTRY",
+    "serve"
+]
+
+
+# seconds, from a fast in-memory command up to a slow bcrypt
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+
+class _PerThread:
+    """
+    A row of values kept separately by every thread that updates them, so
+    updates never take a lock or contend with other threads. Rows of threads
+    that have finished are folded into a single row
+    """
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._local = threading.local()
+        self._rows: dict[int, list] = {}
+        self._retired = [0] * size
+        # rows of finished threads, appended to without a lock since a
+        # thread may finish at any point, even while the lock is held
+        self._dead: list[list] = []
+        self._lock = threading.Lock()
+
+    def row(self) -> list:
+        try:
+            return self._local.row
+        except AttributeError:
+            pass
+
+        row = [0] * self._size
+        self._local.row = row
+
+        with self._lock:
+            self._fold()
+            self._rows[id(row)] = row
+
+        weakref.finalize(threading.current_thread(), self._dead.append, row)
+        return row
+
+    def _fold(self) -> None:
+        while self._dead:
+            row = self._dead.pop()
+            self._rows.pop(id(row), None)
+            for i, value in enumerate(row):
+                self._retired[i] += value
+
+    def totals(self) -> list:
+        with self._lock:
+            self._fold()
+            rows = list(self._rows.values())
+            totals = list(self._retired)
+
+        for row in rows:
+            for i, value in enumerate(row):
+                totals[i] += value
+
+        return totals
+
+
+def _labels(labels: dict[str, str], **extra: str) -> str:
+    labels = {**labels, **extra}
+
+    if not labels:
+        return ""
+
+    return "{" + ",".join(
+            f'{key}="{value}"' for key, value in labels.items()
+            ) + "}"
+
+
+class Counter:
+    def __init__(self, labels: dict[str, str] | None = None) -> None:
+        self.labels = labels or {}
+        self._values = _PerThread(1)
+
+    def inc(self, n: float = 1) -> None:
+        self._values.row()[0] += n
+
+    def samples(self, name: str) -> list[str]:
+        return [f"{name}{_labels(self.labels)} {self._values.totals()[0]}"]
+
+
+class Histogram:
+    """
+    Counts observations into buckets by upper bound, along with their sum
+    """
+    def __init__(
+            self,
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+            labels: dict[str, str] | None = None
+            ) -> None:
+        self.buckets = buckets
+        self.labels = labels or {}
+        # a count per bucket, one for past the last bucket, then the sum
+        self._values = _PerThread(len(buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        row = self._values.row()
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def samples(self, name: str) -> list[str]:
+        *counts, total = self._values.totals()
+        samples = []
+        cumulative = 0
+
+        for bound, count in zip([*self.buckets, "+Inf"], counts):
+            cumulative += count
+            samples.append(
+                    f"{name}_bucket{_labels(self.labels, le = str(bound))}"
+                    f" {cumulative}"
+                    )
+
+        samples.append(f"{name}_sum{_labels(self.labels)} {total}")
+        samples.append(f"{name}_count{_labels(self.labels)} {cumulative}")
+        return samples
+
+
+class _Gauge:
+    """
+    Read from a callback when collected, so nothing is spent keeping it up
+    to date
+    """
+    def __init__(self, fn, labels: dict[str, str] | None = None) -> None:
+        self.fn = fn
+        self.labels = labels or {}
+
+    def samples(self, name: str) -> list[str]:
+        return [f"{name}{_labels(self.labels)} {self.fn()}"]
+
+
+class Registry:
+    def __init__(self) -> None:
+        # name -> (help, type, every metric with that name)
+        self._families: dict[str, tuple[str, str, list]] = {}
+        # (prefix, help, fn) for gauges read from a dict, see gauges
+        self._collectors: list[tuple[str, str, object]] = []
+        self._lock = threading.Lock()
+
+    def _add(self, name: str, help: str, kind: str, metric):
+        with self._lock:
+            self._families.setdefault(name, (help, kind, []))[2].append(metric)
+
+        return metric
+
+    def counter(
+            self, name: str, help: str, labels: dict[str, str] | None = None
+            ) -> Counter:
+        return self._add(name, help, "counter", Counter(labels))
+
+    def histogram(
+            self,
+            name: str,
+            help: str,
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+            labels: dict[str, str] | None = None
+            ) -> Histogram:
+        return self._add(name, help, "histogram", Histogram(buckets, labels))
+
+    def gauge(
+            self, name: str, help: str, fn, labels: dict[str, str] | None = None
+            ) -> None:
+        """
+        fn is called for the value each time metrics are collected
+        """
+        self._add(name, help, "gauge", _Gauge(fn, labels))
+
+    def gauges(self, prefix: str, help: str, fn) -> None:
+        """
+        fn returns a dict, each key of which becomes the gauge prefix_key.
+        It is called once each time metrics are collected
+        """
+        with self._lock:
+            self._collectors.append((prefix, help, fn))
+
+    def collect(self) -> str:
+        """
+        Every metric in the Prometheus text format
+        """
+        with self._lock:
+            families = list(self._families.items())
+            collectors = list(self._collectors)
+
+        lines = []
+        for name, (help, kind, metrics) in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+
+            for metric in metrics:
+                lines.extend(metric.samples(name))
+
+        for prefix, help, fn in collectors:
+            for key, value in fn().items():
+                lines.append(f"# HELP {prefix}_{key} {help}")
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def serve(port: int, registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serves registry at http://127.0.0.1:<port>/metrics from a background
+    thread
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+
+            body = registry.collect().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    return server
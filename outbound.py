@@ -0,0 +1,116 @@
+from collections import deque
+from threading import Condition
+from codec import skip_sent
+
+__all__ = [
+    "OutboundQueue"
+]
+
+
+class OutboundQueue:
+    """
+    Frames waiting to be written to one connection, so sending never blocks
+    the thread or event loop that produced them. Sizes are in bytes and count
+    frames until they have been written.
+
+    Once the queue grows past high_watermark it is congested until it drains
+    back to low_watermark. While congested, a new droppable frame replaces the
+    droppable frames still queued, so a slow viewer only gets the latest
+    BOARDSTATUS. A droppable frame that leaves more than max_bytes queued
+    means the connection can't keep up at all and should be evicted
+    """
+    def __init__(
+            self,
+            high_watermark: int = 64 * 1024,
+            low_watermark: int = 16 * 1024,
+            max_bytes: int = 1024 * 1024
+            ) -> None:
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.max_bytes = max_bytes
+
+        self._frames: deque[tuple[bytes, bool]] = deque()
+        self._ready = Condition()
+        # called after frames are pushed, for writers that can't block
+        self.on_push = None
+
+        self.size = 0
+        self.congested = False
+        self.dropped = 0
+        self.closed = False
+
+    def push(
+            self, frames: list[bytes], droppable: bool = False, send_now = None
+            ) -> bool:
+        """
+        If nothing is queued or being written, send_now is first given the
+        frames to write without blocking, returning how many bytes it wrote.
+        Only what is left is queued. Returns False if the connection should be
+        evicted
+        """
+        with self._ready:
+            if self.closed:
+                return True
+
+            if send_now is not None and self.size == 0:
+                if not (frames := skip_sent(frames, send_now(frames))):
+                    return True
+
+            if droppable and self.congested:
+                kept = deque(entry for entry in self._frames if not entry[1])
+                self.dropped += len(self._frames) - len(kept)
+                self.size -= sum(len(frame) for frame, _ in self._frames)
+                self.size += sum(len(frame) for frame, _ in kept)
+                self._frames = kept
+
+            for frame in frames:
+                self._frames.append((frame, droppable))
+                self.size += len(frame)
+
+            if self.size > self.high_watermark:
+                self.congested = True
+
+            self._ready.notify()
+
+        if self.on_push is not None:
+            self.on_push()
+
+        return not (droppable and self.size > self.max_bytes)
+
+    def take(self, block: bool = True) -> list[bytes]:
+        """
+        Removes every queued frame to be written, call sent once they have
+        been. Returns [] once closed, or when empty if block is False
+        """
+        with self._ready:
+            while block and not self._frames and not self.closed:
+                self._ready.wait()
+
+            frames = [frame for frame, _ in self._frames]
+            self._frames.clear()
+            return frames
+
+    def sent(self, frames: list[bytes]) -> int:
+        """
+        Returns the bytes in frames
+        """
+        n = sum(len(frame) for frame in frames)
+
+        with self._ready:
+            self.size -= n
+
+            if self.size <= self.low_watermark:
+                self.congested = False
+
+        return n
+
+    def close(self) -> None:
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+
+        if self.on_push is not None:
+            self.on_push()
+
+    def __len__(self) -> int:
+        return len(self._frames)
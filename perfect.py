@@ -0,0 +1,89 @@
+import game
+import bitboard
+
+__all__ = [
+    "best_move",
+    "value",
+    "best_move_on_board"
+]
+
+
+#############################################################
+############### Private functions—do not use! ###############
+#############################################################
+
+# both keyed by (mine << 9) | theirs, for the player about to move holding
+# the cells in mine. Scores are positive for a win, larger the sooner it
+# comes, negative for a loss and 0 for a draw
+_SCORES: dict[int, int] = {}
+_BEST: dict[int, tuple[int, int]] = {}
+
+
+def _solve(mine: int, theirs: int) -> int:
+    key = (mine << bitboard.SIZE * bitboard.SIZE) | theirs
+
+    if (score := _SCORES.get(key)) is not None:
+        return score
+
+    free = bitboard.FULL & ~(mine | theirs)
+
+    if bitboard.wins(theirs):
+        score = -(free.bit_count() + 1)
+    elif not free:
+        score = 0
+    else:
+        score = None
+        cells = free
+        while cells:
+            bit = cells & -cells
+            cells ^= bit
+
+            # negamax, the other player moves next
+            move_score = -_solve(theirs, mine | bit)
+
+            if score is None or move_score > score:
+                score = move_score
+                i = bit.bit_length() - 1
+                _BEST[key] = (i % bitboard.SIZE, i // bitboard.SIZE)
+
+    _SCORES[key] = score
+    return score
+
+
+# every position reachable from an empty board, crosses moving first
+_solve(0, 0)
+
+##########################################################
+############### Public functions—use these ###############
+##########################################################
+
+def best_move(mine: int, theirs: int) -> tuple[int, int]:
+    """
+    The (x, y) of a perfect move for the player to move holding the cells in
+    mine, against the cells in theirs. Only for boards reachable in a game
+    that hasn't ended
+    """
+    return _BEST[(mine << bitboard.SIZE * bitboard.SIZE) | theirs]
+
+
+def value(mine: int, theirs: int) -> int:
+    """
+    1 if the player to move wins with perfect play, -1 if they lose and 0
+    for a draw
+    """
+    score = _SCORES[(mine << bitboard.SIZE * bitboard.SIZE) | theirs]
+    return (score > 0) - (score < 0)
+
+
+def best_move_on_board(player: str, board: game.Board) -> tuple[int, int]:
+    """
+    Same as best_move for a board from game.create_board, returns (x, y)
+    """
+    mine = theirs = 0
+    for y in range(game.BOARD_SIZE):
+        for x in range(game.BOARD_SIZE):
+            if board[y][x] == player:
+                mine |= bitboard.cell(x, y)
+            elif board[y][x] != game.EMPTY:
+                theirs |= bitboard.cell(x, y)
+    return best_move(mine, theirs)
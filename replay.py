@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import variant
+from room import Room
+from gamelog import (
+        BEGIN, PLACE, GAMEEND, NO_WINNER, segment_paths, segment_run, read_events
+        )
+
+__all__ = [
+    "Game",
+    "replay",
+    "verify"
+]
+
+
+# cell marks to BOARDSTATUS digits
+DIGITS = bytes.maketrans(b"\x00\x01\x02", b"012")
+RESULTS = ["won", "draw", "forfeit"]
+
+
+class Game:
+    """
+    A game rebuilt from the log
+    """
+    __slots__ = (
+        "room", "players", "size", "k", "moves", "cells", "code", "winner"
+    )
+
+    def __init__(
+            self, room: str, crosses: str, noughts: str, size: int, k: int
+            ) -> None:
+        self.room = room
+        self.players = (crosses, noughts)
+        self.size = size
+        self.k = k
+        # cells in the order they were played, crosses first
+        self.moves: list[int] = []
+        self.cells = bytearray(size * size)
+        self.code = -1
+        self.winner = NO_WINNER
+
+    def status(self) -> str:
+        """
+        The final board as a digit per cell, like Room.get_board_status for
+        a classic room
+        """
+        return self.cells.translate(DIGITS).decode()
+
+
+def replay(directory: str, on_game) -> int:
+    """
+    Rebuilds every finished game in the log at directory, calling on_game
+    with each as its GAMEEND is read. Games still running when the log ends
+    are skipped. Returns the number of events read
+    """
+    # keyed by game id, which are only unique within a run
+    games: dict[int, Game] = {}
+    run = None
+    events = 0
+
+    for path in segment_paths(directory):
+        # games left running by an earlier run never finish
+        if (segment := segment_run(path)) != run:
+            games.clear()
+            run = segment
+
+        for record in read_events(path):
+            events += 1
+            kind = record[0]
+
+            if kind == PLACE:
+                _, game_id, cell, mark = record
+
+                if (game := games.get(game_id)) is not None:
+                    game.cells[cell] = mark
+                    game.moves.append(cell)
+
+            elif kind == BEGIN:
+                games[record[1]] = Game(*record[2:])
+
+            elif kind == GAMEEND:
+                _, game_id, code, winner = record
+
+                if (game := games.pop(game_id, None)) is not None:
+                    game.code, game.winner = code, winner
+                    on_game(game)
+
+    return events
+
+
+def verify(game: Game) -> bool:
+    """
+    Plays the game's moves through a Room and checks it ends the way the log
+    says it did
+    """
+    room = Room(game.room, game.size, game.k)
+    code = 0
+
+    for cell in game.moves:
+        x, y = cell % game.size, cell // game.size
+
+        if code or not room.is_valid_move(x, y):
+            return False
+
+        room.make_move(x, y)
+
+        if not (code := room.check_for_game_end()):
+            room.alternate_turn()
+
+    if variant.unpack_status(room.get_board_status()) != game.status():
+        return False
+
+    # a forfeit ends a game that is still running
+    if game.code == 2:
+        return code == 0 and game.winner in (0, 1)
+
+    if code == 1:
+        return game.code == 0 and game.winner == 1 - room.cross_turn
+
+    return code == 2 and game.code == 1
+
+
+def main(args: list[str]) -> None:
+    if len(args) != 2 or args[1] not in ["boards", "stats", "verify"]:
+        sys.stderr.write(
+                "Usage: replay.py <game log directory> <boards|stats|verify>\n"
+                )
+        os._exit(1)
+
+    directory, mode = args
+
+    if not os.path.isdir(directory):
+        sys.stderr.write(f"Error: {directory} doesn't exist.\n")
+        os._exit(1)
+
+    # wins, losses and draws, forfeits count as a win and a loss
+    stats: dict[str, list[int]] = {}
+    failed = []
+
+    def on_game(game: Game) -> None:
+        if mode == "boards":
+            result = RESULTS[game.code]
+            if game.winner != NO_WINNER:
+                result += f" {game.players[game.winner]}"
+
+            crosses, noughts = game.players
+            print(f"{game.room} {crosses} {noughts} {game.status()} {result}")
+
+        elif mode == "stats":
+            for i, player in enumerate(game.players):
+                record = stats.setdefault(player, [0, 0, 0])
+
+                if game.winner == NO_WINNER:
+                    record[2] += 1
+                else:
+                    record[game.winner != i] += 1
+
+        elif not verify(game):
+            failed.append(game)
+
+    start = time.perf_counter()
+    events = replay(directory, on_game)
+    elapsed = time.perf_counter() - start
+
+    if mode == "stats":
+        for player, (wins, losses, draws) in sorted(stats.items()):
+            print(f"{player} {wins} won, {losses} lost, {draws} drawn")
+
+    if mode == "verify":
+        for game in failed:
+            crosses, noughts = game.players
+            print(f"Mismatch in {game.room} between {crosses} and {noughts}")
+        print(f"{len(failed)} games didn't match")
+
+    sys.stderr.write(
+            f"{events} events in {elapsed:.2f}s,"
+            f" {events / (elapsed or 1):,.0f} events/s\n"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
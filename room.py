@@ -1,13 +1,101 @@
 import game
+import time
+import bitboard
+import perfect
+from variant import VariantBoard
+from gamelog import GameLog, NO_WINNER
+from bisect import bisect_left, insort
+from threading import RLock
+
+# the second player of a bot room, whose moves the server makes. Can't be
+# registered as an account
+BOT_NAME = "BOT"
 
 class Room:
-    def __init__(self, name: str) -> None:
+    __slots__ = (
+        "name",
+        "players",
+        "viewers",
+        "in_progress",
+        "cross_turn",
+        "_crosses",
+        "_noughts",
+        "variant",
+        "_last_move",
+        "bot",
+        "seq",
+        "session",
+        "last_active",
+        "clients"
+    )
+
+    def __init__(
+            self,
+            name: str,
+            size: int = game.BOARD_SIZE,
+            k: int = game.BOARD_SIZE,
+            bot: bool = False
+            ) -> None:
         self.name: str = name
         self.players: list[str] = []
         self.viewers: list[str] = []
         self.in_progress: bool = False
         self.cross_turn: bool = True
-        self._board = game.create_board()
+        # the cells held by each player, see bitboard
+        self._crosses = 0
+        self._noughts = 0
+        # board of a larger or k in a row room, which the bitboard is unused by
+        self.variant: VariantBoard | None = None
+        self._last_move = (0, 0)
+        self._set_variant(size, k)
+        # the server plays second, only on the classic board
+        self.bot = bot
+        # moves made in the current game, numbers each MOVE sent to viewers
+        self.seq = 0
+        self.session = GameSession(self)
+        self.last_active = time.monotonic()
+        # live connections of players and viewers, used as an ordered set
+        self.clients: dict = {}
+
+    def reset(
+            self,
+            name: str,
+            size: int = game.BOARD_SIZE,
+            k: int = game.BOARD_SIZE,
+            bot: bool = False
+            ) -> None:
+        """
+        Reuses a reclaimed room as a new room called name
+        """
+        self.name = name
+        self.players.clear()
+        self.viewers.clear()
+        self.clients.clear()
+        self.in_progress = False
+        self.cross_turn = True
+        self._crosses = 0
+        self._noughts = 0
+        self._set_variant(size, k)
+        self.bot = bot
+        self.seq = 0
+
+        self.session.state = GameSession.WAITING
+        self.last_active = time.monotonic()
+
+    def _set_variant(self, size: int, k: int) -> None:
+        if size == game.BOARD_SIZE and k == game.BOARD_SIZE:
+            self.variant = None
+        elif (
+                self.variant is not None
+                and self.variant.size == size
+                and self.variant.k == k
+                ):
+            self.variant.clear()
+        else:
+            self.variant = VariantBoard(size, k)
+
+    def is_empty(self) -> bool:
+        return not self.players and not self.viewers
 
     def game_is_full(self) -> bool:
         return len(self.players) >= 2
@@ -19,29 +107,82 @@ class Room:
         if as_player:
             self.players.append(player_name)
 
+            if self.bot:
+                self.players.append(BOT_NAME)
+
         else:
             self.viewers.append(player_name)
 
+        self.last_active = time.monotonic()
+
+    def leave(self, player_name: str) -> None:
+        if player_name in self.players:
+            self.players.remove(player_name)
+
+            if self.bot:
+                self.players.clear()
+
+        if player_name in self.viewers:
+            self.viewers.remove(player_name)
+
+    def is_valid_move(self, x: int, y: int) -> bool:
+        if self.variant is not None:
+            return self.variant.is_valid_move(x, y)
+
+        return (
+                0 <= x < game.BOARD_SIZE
+                and 0 <= y < game.BOARD_SIZE
+                and not (self._crosses | self._noughts) & bitboard.cell(x, y)
+                )
+
     def make_move(self, x: int, y: int) -> None:
-        self._board[x][y] = game.CROSS if self.cross_turn else game.NOUGHT
+        if self.variant is not None:
+            self.variant.place(x, y, self.cross_turn)
+            self._last_move = (x, y)
+        elif self.cross_turn:
+            self._crosses |= bitboard.cell(x, y)
+        else:
+            self._noughts |= bitboard.cell(x, y)
+        self.seq += 1
+        self.last_active = time.monotonic()
+
+    def board_size(self) -> int:
+        return self.variant.size if self.variant is not None else game.BOARD_SIZE
+
+    def win_length(self) -> int:
+        return self.variant.k if self.variant is not None else game.BOARD_SIZE
+
+    def move_delta(self, x: int, y: int) -> str:
+        """
+        MOVE:<cell>:<mark>:<seq> for the move just made at x, y, where cell
+        indexes the board status and mark is its digit there
+        """
+        mark = 1 if self.cross_turn else 2
+        return f"MOVE:{y * self.board_size() + x}:{mark}:{self.seq}"
+
+    def snapshot(self) -> str:
+        """
+        SNAPSHOT:<seq>:<board status>, the board after the move numbered seq
+        """
+        return f"SNAPSHOT:{self.seq}:{self.get_board_status()}"
+
+    def bot_move(self) -> tuple[int, int]:
+        """
+        The perfect move for whoever's turn it is, in constant time
+        """
+        if self.cross_turn:
+            return perfect.best_move(self._crosses, self._noughts)
+
+        return perfect.best_move(self._noughts, self._crosses)
 
     def alternate_turn(self) -> None:
         self.cross_turn = not self.cross_turn
     
     def get_board_status(self) -> str:
-        res = ""
-        for y in range(len(self._board)):
-            for x in range(len(self._board[y])):
-                if self._board[x][y] == game.EMPTY:
-                    res += "0"
-                elif self._board[x][y] == game.CROSS:
-                    res += "1"
-                elif self._board[x][y] == game.NOUGHT:
-                    res += "2"
-                else:
-                    raise Exception(f"Invalid square in board: {self._board}")
-
-        return res
+        if self.variant is not None:
+            return self.variant.status()
+
+        return bitboard.status(self._crosses, self._noughts)
     
     def check_for_game_end(self) -> int:
         """
@@ -51,62 +192,303 @@ class Room:
             2 -> draw
         use code - 1 for sending message to client
         """
-        player = game.CROSS if self.cross_turn else game.NOUGHT
+        if self.variant is not None:
+            if self.variant.wins_through(*self._last_move):
+                return 1
+
+            return 2 if self.variant.is_full() else 0
 
-        if game.player_wins(player, self._board):
+        if bitboard.wins(self._crosses if self.cross_turn else self._noughts):
             return 1
 
-        if game.players_draw(self._board):
+        if bitboard.is_full(self._crosses, self._noughts):
             return 2
         
         return 0
 
 
+class GameSession:
+    """
+    Event driven state machine for the game played in a room. Each event
+    returns the messages that should be broadcast to the room, so no thread
+    has to wait on the players while the game is running. BOARDSTATUS is
+    only for the players and MOVE only for the viewers
+    """
+    WAITING = 0
+    PLAYING = 1
+    FINISHED = 2
+
+    # every game's events are recorded here when set
+    log: GameLog | None = None
+
+    def __init__(self, room: Room) -> None:
+        self.room = room
+        self.state = GameSession.WAITING
+        # id of the current game in log
+        self.game_id = 0
+        # reentrant so callers can hold it while broadcasting the result of
+        # an event, keeping messages to the room in order
+        self.lock = RLock()
+
+    def current_player(self) -> str:
+        return self.room.players[1 - self.room.cross_turn]
+
+    def start(self) -> list[str]:
+        with self.lock:
+            if self.state != GameSession.WAITING or not self.room.game_is_full():
+                return []
+
+            self.state = GameSession.PLAYING
+            self.room.in_progress = True
+            msg = f"BEGIN:{self.room.players[0]}:{self.room.players[1]}"
+
+            if GameSession.log is not None:
+                self.game_id = GameSession.log.begin(
+                        self.room.name,
+                        self.room.players,
+                        self.room.board_size(),
+                        self.room.win_length()
+                        )
+
+            # classic rooms keep the original message
+            if (variant := self.room.variant) is not None:
+                msg += f":{variant.size}:{variant.k}"
+
+            return [msg]
+
+    def place(self, player: str, x: int, y: int) -> list[str]:
+        """
+        Ignores moves made out of turn or outside of a running game
+        """
+        with self.lock:
+            if (
+                    self.state != GameSession.PLAYING
+                    or player != self.current_player()
+                    or not self.room.is_valid_move(x, y)
+                    ):
+                return []
+
+            self.room.make_move(x, y)
+
+            if GameSession.log is not None:
+                GameSession.log.place(
+                        self.game_id,
+                        y * self.room.board_size() + x,
+                        1 if self.room.cross_turn else 2
+                        )
+
+            if (code := self.room.check_for_game_end()):
+                msg = f"GAMEEND:{self.room.get_board_status()}:{code - 1}"
+
+                # game won
+                if code == 1:
+                    msg += f":{player}"
+                    return self._finish(msg, 0, 1 - self.room.cross_turn)
+
+                return self._finish(msg, 1)
+
+            # players are sent the whole board, viewers only what changed
+            msgs = [
+                    f"BOARDSTATUS:{self.room.get_board_status()}",
+                    self.room.move_delta(x, y)
+                    ]
+            self.room.alternate_turn()
+
+            if self.room.bot and self.current_player() == BOT_NAME:
+                msgs += self.place(BOT_NAME, *self.room.bot_move())
+
+            return msgs
+
+    def forfeit(self, player: str) -> list[str]:
+        """
+        Used both for FORFEIT messages and for players disconnecting mid game
+        """
+        with self.lock:
+            if self.state != GameSession.PLAYING or player not in self.room.players:
+                return []
+
+            i = 1 - self.room.players.index(player)
+            winner = self.room.players[i]
+            return self._finish(
+                    f"GAMEEND:{self.room.get_board_status()}:2:{winner}", 2, i
+                    )
+
+    def _finish(self, msg: str, code: int, winner: int = NO_WINNER) -> list[str]:
+        """
+        code and winner, the index of the winning player, are as in GAMEEND
+        """
+        self.state = GameSession.FINISHED
+        self.room.in_progress = False
+
+        if GameSession.log is not None:
+            GameSession.log.end(self.game_id, code, winner)
+
+        return [msg]
+
+
 class Rooms:
-    def __init__(self) -> None:
-        self._rooms: list[Room] = []
+    def __init__(self, max_rooms: int = 256) -> None:
+        self.max_rooms = max_rooms
+        # reclaimed rooms waiting to be reused by create
+        self._pool: list[Room] = []
+        # keyed by room name, in order of creation
+        self._rooms: dict[str, Room] = {}
+        # rooms with a free player slot, used as an ordered set
+        self._open: dict[str, Room] = {}
+        # names in sorted order for paging through and filtering by prefix
+        self._sorted: list[str] = []
+        self._sorted_open: list[str] = []
+        self._lock = RLock()
 
     def join(self, room_name: str, username: str, as_player: bool) -> None:
         """
         Set as_player to true to join as a player, false to join as viewer
         """
-        for room in self._rooms:
-            if room.name == room_name:
-                room.join(username, as_player)
+        with self._lock:
+            if (room := self._rooms.get(room_name)) is None:
                 return
 
-    def create(self, name: str) -> None:
-        if self.server_is_full():
-            raise Exception("Only create a room after checking that server is not full")
+            room.join(username, as_player)
 
-        self._rooms.append(Room(name))
+            if room.game_is_full() and self._open.pop(room_name, None):
+                Rooms._remove_sorted(self._sorted_open, room_name)
+
+    def leave(self, room_name: str, username: str) -> None:
+        """
+        Removes username from the room as a player and as a viewer
+        """
+        with self._lock:
+            if (room := self._rooms.get(room_name)) is None:
+                return
+
+            room.leave(username)
+
+            if not room.game_is_full() and room_name not in self._open:
+                self._open[room_name] = room
+                insort(self._sorted_open, room_name)
+
+    def create(
+            self,
+            name: str,
+            size: int = game.BOARD_SIZE,
+            k: int = game.BOARD_SIZE,
+            bot: bool = False
+            ) -> None:
+        """
+        Rooms are played on a size x size board, won with k in a row. In a bot
+        room the first player to join plays against the server
+        """
+        with self._lock:
+            if self.server_is_full():
+                raise Exception("Only create a room after checking that server is not full")
+
+            if self._pool:
+                room = self._pool.pop()
+                room.reset(name, size, k, bot)
+            else:
+                room = Room(name, size, k, bot)
+
+            self._rooms[name] = self._open[name] = room
+            insort(self._sorted, name)
+            insort(self._sorted_open, name)
+
+    def remove(self, room_name: str) -> None:
+        """
+        Reclaims a room, keeping it to be reused by a later create
+        """
+        with self._lock:
+            if (room := self._rooms.pop(room_name, None)) is None:
+                return
+
+            Rooms._remove_sorted(self._sorted, room_name)
+
+            if self._open.pop(room_name, None):
+                Rooms._remove_sorted(self._sorted_open, room_name)
+
+            if len(self._pool) < self.max_rooms:
+                self._pool.append(room)
+
+    def idle_rooms(self, timeout: float) -> list[Room]:
+        """
+        Returns rooms without a game in progress or anyone connected in them
+        that haven't been joined or played in for timeout seconds
+        """
+        cutoff = time.monotonic() - timeout
+
+        with self._lock:
+            return [
+                    room for room in self._rooms.values()
+                    if not room.in_progress
+                    and not room.clients
+                    and room.last_active < cutoff
+                    ]
+
+    @staticmethod
+    def _remove_sorted(names: list[str], name: str) -> None:
+        i = bisect_left(names, name)
+        if i < len(names) and names[i] == name:
+            del names[i]
+
+    def room_count(self, is_player: bool) -> int:
+        """
+        Number of rooms get_room_names would return
+        """
+        return len(self._open if is_player else self._rooms)
 
     def get_room_names(self, is_player: bool) -> list[str]:
         if is_player:
-            return [room.name for room in self._rooms if not room.game_is_full()]
+            return list(self._open)
+
+        return list(self._rooms)
+
+    def get_room_page(
+            self, is_player: bool, limit: int, after: str = "", prefix: str = ""
+            ) -> tuple[list[str], str]:
+        """
+        Returns up to limit room names in sorted order that come after the
+        name after and start with prefix, along with the cursor to pass as
+        after for the next page. The cursor is "" when there are no more pages
+        """
+        names = self._sorted_open if is_player else self._sorted
+
+        with self._lock:
+            start = max(bisect_left(names, prefix), bisect_left(names, after))
 
-        return [room.name for room in self._rooms]
+            if start < len(names) and names[start] == after:
+                start += 1
+
+            page = []
+            for name in names[start:start + limit + 1]:
+                if not name.startswith(prefix):
+                    break
+                page.append(name)
+
+        if len(page) > limit:
+            return page[:limit], page[limit - 1]
+
+        return page, ""
 
     def get_room(self, room_name: str) -> Room:
-        for room in self._rooms:
-            if room.name == room_name:
-                return room
+        if (room := self._rooms.get(room_name)) is None:
+            raise Exception("Only call after checking room exists")
 
-        raise Exception("Only call after checking room exists")
+        return room
 
     def room_exists(self, room_name: str) -> bool:
-        for room in self._rooms:
-            if room.name == room_name:
-                return True
-
-        return False
+        return room_name in self._rooms
 
     def game_is_full(self, room_name: str) -> bool:
-        for room in self._rooms:
-            if room.name == room_name:
-                return room.game_is_full()
+        if (room := self._rooms.get(room_name)) is None:
+            raise Exception("Should not be trying to check if a non existent room is full")
 
-        raise Exception("Should not be trying to check if a non existent room is full")
+        return room.game_is_full()
 
     def server_is_full(self) -> bool:
-        return len(self._rooms) >= 256
+        return len(self._rooms) >= self.max_rooms
+
+    def games_in_progress(self) -> int:
+        with self._lock:
+            return sum(room.in_progress for room in self._rooms.values())
+
+    def __len__(self) -> int:
+        return len(self._rooms)
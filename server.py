@@ -2,24 +2,71 @@ import sys
 import time
 import socket
 import os
-import bcrypt
 import json
-from threading import Thread
-from room import Room, Rooms
+import asyncio
+import game
+import serverlog
+import itertools
+from concurrent.futures import Future
+from threading import Thread, Lock
+from room import Room, Rooms, GameSession, BOT_NAME
 from logins import Logins
+from codec import FrameDecoder, FrameTooLong, encode_frame, send_frames, IOV_MAX
+from auth import AuthExecutor, AuthQueueFull
+from sessions import SessionStore
+from userstore import UserStore, open_user_store
+from outbound import OutboundQueue
+from variant import is_valid_variant
+from gamelog import GameLog
+from metrics import REGISTRY, serve as serve_metrics
+from serverlog import logger
+
+# most rooms a single paginated ROOMLIST reply may contain
+MAX_ROOMLIST_PAGE = 100
+# seconds between checks for idle rooms to reclaim
+ROOM_SWEEP_INTERVAL = 30
+
+COMMAND_SECONDS = {
+    cmd: REGISTRY.histogram(
+        "tictactoe_command_seconds",
+        "Time taken to handle a command, including any wait for bcrypt",
+        labels = {"command": cmd}
+        )
+    for cmd in [
+        "LOGIN", "REGISTER", "RESUME", "ROOMLIST", "CREATE", "JOIN", "PLACE",
+        "FORFEIT", "RESYNC"
+    ]
+}
+RECEIVED_BYTES = REGISTRY.counter(
+        "tictactoe_received_bytes_total", "Bytes received from clients"
+        )
+SENT_BYTES = REGISTRY.counter(
+        "tictactoe_sent_bytes_total", "Bytes written to clients"
+        )
 
 class Client:
     def __init__(self, sock: socket.socket) -> None:
         self.socket = sock
         self.account = None
-        self.playing_game = False
+        self.room: Room | None = None
+
+        # replies queued while a batch of pipelined commands is handled
+        # each frame along with whether it is droppable
+        self._pending: list[tuple[bytes, bool]] | None = None
+        self._pending_lock = Lock()
+
+        # frames waiting to be written by write_outbound
+        self.outbound = OutboundQueue(*Server.outbound_limits)
 
     def send_message(self, msg: bytes):
-        self.socket.send(msg + "\n".encode())
-        res = f"{msg.decode()}"
-        if self.account:
-            res += f" to {self.account.name}"
-        print(res)
+        self.send_frame(encode_frame(msg))
+
+        if serverlog.tracing:
+            serverlog.trace(
+                    "%s to %s",
+                    serverlog.redact(msg.decode(), False),
+                    self.name
+                    )
 
     @property
     def name(self) -> str | None:
@@ -31,10 +78,111 @@ class Client:
 
         return self.account.name
 
+    def send_frame(self, frame: bytes, droppable: bool = False) -> None:
+        """
+        Queues an already encoded frame, which may be shared with other
+        clients. Droppable frames may be skipped if the client falls behind.
+        While a batch is open every frame waits for it, so frames from other
+        connections can't overtake the replies already in it
+        """
+        with self._pending_lock:
+            if self._pending is not None:
+                self._pending.append((frame, droppable))
+                return
+
+        if not self.outbound.push([frame], droppable, self.try_send):
+            self.evict()
+
+    def try_send(self, frames: list[bytes]) -> int:
+        """
+        Writes as much as possible without blocking, returns the bytes written
+        """
+        try:
+            n = self.socket.sendmsg(frames[:IOV_MAX], [], socket.MSG_DONTWAIT)
+        except OSError:
+            # left to write_outbound, which cleans up on real errors
+            return 0
+
+        SENT_BYTES.inc(n)
+        return n
+
+    def write_outbound(self) -> None:
+        """
+        Writes queued frames until the client is closed, run on its own thread
+        """
+        while (frames := self.outbound.take()):
+            try:
+                send_frames(self.socket, frames)
+            except OSError:
+                return
+
+            SENT_BYTES.inc(self.outbound.sent(frames))
+
+    def evict(self) -> None:
+        """
+        Drops a connection that can't keep up, its reader then cleans it up
+        """
+        Server.evicted_clients += 1
+
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def start_batch(self) -> None:
+        """
+        Holds back messages until flush so replies to pipelined commands are
+        sent in a single write
+        """
+        with self._pending_lock:
+            self._pending = []
+
+    def flush(self) -> None:
+        # the batch is queued before the lock is released, so a frame sent
+        # from another thread meanwhile can't get ahead of it
+        with self._pending_lock:
+            pending, self._pending = self._pending, None
+
+            for droppable, run in itertools.groupby(
+                    pending or [], lambda entry : entry[1]
+                    ):
+                if not self.outbound.push(
+                        [frame for frame, _ in run], droppable, self.try_send
+                        ):
+                    self.evict()
+                    return
+
     def close(self):
-        if self.account:
+        # a resumed session may have taken over the account already
+        if self.account and self.account.owner is self:
             self.account.logout()
 
+        if not self.outbound.closed:
+            self.outbound.close()
+            Server.dropped_frames += self.outbound.dropped
+
+        self.close_socket()
+
+    def close_socket(self) -> None:
+        """
+        Tells the other end straight away rather than whenever the socket is
+        garbage collected
+        """
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self.socket.close()
+
+    def defer(self, future: Future, callback) -> None:
+        """
+        Calls callback with future once it completes. Commands from this
+        client are not handled until then, which keeps pipelined commands in
+        order. Threaded clients simply block until the result is ready
+        """
+        callback(future)
+
     def has_auth(self) -> bool:
         return self.account is not None
 
@@ -48,41 +196,155 @@ class Client:
             self.send_message("LOGIN:ACKSTATUS:3".encode())
             return
 
-        account = Server.logins.try_login(args[0], args[1])
+        try:
+            future = Server.logins.try_login(args[0], args[1], Server.auth)
+        except AuthQueueFull:
+            self.send_message("LOGIN:ACKSTATUS:4".encode())
+            return
+
+        self.defer(future, self.finish_login)
+
+    def finish_login(self, future: Future) -> None:
+        account = future.result()
 
         if isinstance(account, int):
             self.send_message(f"LOGIN:ACKSTATUS:{account}".encode())
             return
 
         self.account = account
+        account.owner = self
         # indicates successful login
         self.send_message("LOGIN:ACKSTATUS:0".encode())
+        self.send_session_token()
+
+    def send_session_token(self) -> None:
+        token = Server.sessions.issue(self.account.name)
+        self.send_message(f"SESSION:{token}".encode())
+
+    def try_resume(self, args: list[str]) -> None:
+        """
+        Restores the login of a previous connection from its session token
+        """
+        if len(args) != 1 or not SessionStore.is_well_formed(args[0]):
+            self.send_message("RESUME:ACKSTATUS:2".encode())
+            return
+
+        if (
+                (username := Server.sessions.resume(args[0])) is None
+                or (account := Server.logins.resume(username)) is None
+                ):
+            self.send_message("RESUME:ACKSTATUS:1".encode())
+            return
+
+        # a connection already logged in as another account gives it up
+        # first, as if it had disconnected
+        if self.account is not None and self.account is not account:
+            Server.leave_room(self)
+            self.account.logout()
+            self.account = None
+
+        # the old connection may not have been cleaned up yet, detach it so
+        # closing it doesn't log this one out
+        if (old := account.owner) is not None and old is not self:
+            old.account = None
+
+            if (room := old.room) is not None:
+                room.clients.pop(old, None)
+                room.clients[self] = None
+
+            self.room = room
+            old.room = None
+
+        self.account = account
+        account.owner = self
+        self.send_message("RESUME:ACKSTATUS:0".encode())
+        self.send_session_token()
 
     def try_register(self, args: list[str]) -> None:
         if len(args) != 2:
             self.send_message("REGISTER:ACKSTATUS:2".encode())
+            return
 
         username, password = args
 
+        if username == BOT_NAME or Server.logins.account_exists(username):
+            self.send_message("REGISTER:ACKSTATUS:1".encode())
+            return
+
+        try:
+            future = Server.auth.hash_password(password)
+        except AuthQueueFull:
+            self.send_message("REGISTER:ACKSTATUS:3".encode())
+            return
+
+        self.defer(
+                future,
+                lambda hashed : self.finish_register(username, hashed)
+                )
+
+    def finish_register(self, username: str, future: Future) -> None:
+        # may have been registered by someone else while hashing
         if Server.logins.account_exists(username):
             self.send_message("REGISTER:ACKSTATUS:1".encode())
             return
 
-        Server.register_account(username, password)
+        self.defer(
+                Server.register_account(username, future.result()),
+                self.finish_saving_account
+                )
+
+    def finish_saving_account(self, future: Future) -> None:
+        future.result()
         self.send_message("REGISTER:ACKSTATUS:0".encode())
 
     def roomlist(self, args: list[str]) -> None:
+        """
+        ROOMLIST:<mode> lists every room. ROOMLIST:<mode>:<page size>:<cursor>:
+        <prefix> lists one page of rooms starting with prefix, sorted by name,
+        where cursor is "" for the first page and then the cursor sent back
+        with the previous page
+        """
         if (
-                len(args) != 1
+                len(args) not in [1, 4]
                 or (mode := args[0]) not in ["PLAYER", "VIEWER"]
                 ):
             self.send_message("ROOMLIST:ACKSTATUS:1".encode())
             return
-        
-        roomlist = ",".join(Server.rooms.get_room_names(mode == "PLAYER"))        
+
+        if len(args) == 4:
+            self.roomlist_page(mode, *args[1:])
+            return
+
+        # every name wouldn't fit in a frame, so only the first page is sent
+        # along with the cursor for the next
+        if Server.rooms.room_count(mode == "PLAYER") > MAX_ROOMLIST_PAGE:
+            self.roomlist_page(mode, str(MAX_ROOMLIST_PAGE), "", "")
+            return
+
+        roomlist = ",".join(Server.rooms.get_room_names(mode == "PLAYER"))
 
         self.send_message(f"ROOMLIST:ACKSTATUS:0:{roomlist}".encode())
 
+    def roomlist_page(
+            self, mode: str, limit: str, cursor: str, prefix: str
+            ) -> None:
+        try:
+            page_size = int(limit)
+        except ValueError:
+            page_size = 0
+
+        if not 1 <= page_size <= MAX_ROOMLIST_PAGE:
+            self.send_message("ROOMLIST:ACKSTATUS:1".encode())
+            return
+
+        names, cursor = Server.rooms.get_room_page(
+                mode == "PLAYER", page_size, cursor, prefix
+                )
+
+        self.send_message(
+                f"ROOMLIST:ACKSTATUS:0:{','.join(names)}:{cursor}".encode()
+                )
+
     def handle_for_badauth(self) -> bool:
         """
         Returns true if client is unauthorized, else false. Handles sending
@@ -96,11 +358,26 @@ class Client:
     def create_room(self, args: list[str]):
         #TODO: need someway to check if this is a ':' in the name of room vs
         # a separator
-        if len(args) != 1:
+        # CREATE:<name> for a classic room, CREATE:<name>:BOT to play against
+        # the server, CREATE:<name>:<size>:<k> for a size x size board won
+        # with k in a row
+        if len(args) not in [1, 2, 3] or (len(args) == 2 and args[1] != "BOT"):
             self.send_message("CREATE:ACKSTATUS:4".encode())
             return
 
         room_name = args[0]
+        size = k = game.BOARD_SIZE
+        bot = len(args) == 2
+
+        if len(args) == 3:
+            try:
+                size, k = int(args[1]), int(args[2])
+            except ValueError:
+                size = k = 0
+
+            if not is_valid_variant(size, k):
+                self.send_message("CREATE:ACKSTATUS:4".encode())
+                return
 
         # checks for that room name contains only alphanumeric, '-', ' ' or '_'
         # characters and has length is no greater than 20
@@ -123,7 +400,7 @@ class Client:
             self.send_message("CREATE:ACKSTATUS:3".encode())
             return
         
-        Server.rooms.create(room_name)
+        Server.rooms.create(room_name, size, k, bot)
         self.send_message("CREATE:ACKSTATUS:0".encode())
 
     def join_room(self, args: list[str]) -> None:
@@ -145,28 +422,66 @@ class Client:
             self.send_message("JOIN:ACKSTATUS:2".encode())
             return
 
+        room = Server.rooms.get_room(room_name)
+
+        # already in it, as a player or a viewer
+        if room is self.room:
+            self.send_message("JOIN:ACKSTATUS:3".encode())
+            return
+
         # mostly so lsp stops yelling
         if self.account is None:
             raise Exception(
                     "How has this happened - should've been caught by badauth"
                     )
 
-        Server.rooms.join(room_name, self.account.name, mode == "PLAYER")
-        self.send_message("JOIN:ACKSTATUS:0".encode())
+        # a client is only ever in one room. Left before taking the new
+        # room's lock, as taking both could deadlock with a client moving the
+        # other way
+        Server.leave_room(self)
+
+        # held so the game can't start before this client is one of the
+        # room's clients, and no MOVE reaches a viewer joining mid game
+        # before its snapshot
+        with room.session.lock:
+            # may have filled up or been reclaimed since it was checked
+            if room.name != room_name or not Server.rooms.room_exists(room_name):
+                self.send_message("JOIN:ACKSTATUS:1".encode())
+                return
 
-        room = Server.rooms.get_room(room_name)
+            if mode == "PLAYER" and room.game_is_full():
+                self.send_message("JOIN:ACKSTATUS:2".encode())
+                return
 
-        if room.game_is_full() and not room.in_progress:
-            self.send_message("GAME:1".encode())
-            Server.play_game(room)
-            return
+            Server.rooms.join(room_name, self.account.name, mode == "PLAYER")
+            self.send_message("JOIN:ACKSTATUS:0".encode())
+
+            self.room = room
+            room.clients[self] = None
+
+            if room.game_is_full() and not room.in_progress:
+                self.send_message("GAME:1".encode())
+                Server.start_game(room)
+                return
 
-        if room.in_progress:
-            self.send_message("GAME:2".encode())
-            self.send_in_progress_message(room)
+            if room.in_progress:
+                self.send_message("GAME:2".encode())
+                self.send_in_progress_message(room)
+                self.send_message(room.snapshot().encode())
+                return
+
+            self.send_message("GAME:0".encode())
+
+    def resync(self) -> None:
+        """
+        Sends the board again to a viewer that has missed a MOVE
+        """
+        if (room := self.room) is None:
             return
 
-        self.send_message("GAME:0".encode())
+        with room.session.lock:
+            if room.in_progress:
+                self.send_message(room.snapshot().encode())
 
     def send_in_progress_message(self, room: Room) -> None:
         # index of player whos turn it is
@@ -176,13 +491,98 @@ class Client:
                 .encode()
                 )
 
+class AsyncClient(Client):
+    """
+    Client served by the asyncio event loop. Queued frames are written by a
+    task instead of a thread
+    """
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        super().__init__(writer.get_extra_info("socket"))
+        self.writer = writer
+        # completes once a deferred auth result has been handled
+        self.waiting: asyncio.Future | None = None
+
+        self._outbound_ready = asyncio.Event()
+        self.outbound.on_push = self._outbound_ready.set
+        writer.transport.set_write_buffer_limits(
+                self.outbound.high_watermark, self.outbound.low_watermark
+                )
+
+    def try_send(self, frames: list[bytes]) -> int:
+        # the transport already writes straight away when it can
+        return 0
+
+    async def write_outbound_async(self) -> None:
+        while not self.outbound.closed:
+            await self._outbound_ready.wait()
+            self._outbound_ready.clear()
+
+            if not (frames := self.outbound.take(block = False)):
+                continue
+
+            self.writer.writelines(frames)
+
+            try:
+                # waits while the transport is over its high watermark
+                await self.writer.drain()
+            except ConnectionError:
+                return
+
+            SENT_BYTES.inc(self.outbound.sent(frames))
+
+    def evict(self) -> None:
+        Server.evicted_clients += 1
+        self.writer.transport.abort()
+
+    def defer(self, future: Future, callback) -> None:
+        """
+        Runs callback on the event loop once future completes, the connection
+        coroutine awaits self.waiting before handling further commands
+        """
+        self.waiting = asyncio.wrap_future(future)
+        self.waiting.add_done_callback(callback)
+
+    def close_socket(self) -> None:
+        self.writer.close()
+
 class Server:
-    clients: list[Client] = []
+    clients: set[Client] = set()
+    # (high watermark, low watermark, max bytes) for each client's outbound queue
+    outbound_limits = (64 * 1024, 16 * 1024, 1024 * 1024)
+    # totals for clients that have since disconnected are kept here
+    dropped_frames = 0
+    evicted_clients = 0
     rooms = Rooms()
     logins = Logins()
+    auth: AuthExecutor
+    sessions: SessionStore
 
     def __init__(self, config) -> None:
         Server.config = config
+        serverlog.start(
+                config.get_log_level(),
+                config.get_log_file(),
+                config.get_trace_every()
+                )
+
+        Server.auth = AuthExecutor(
+                config.get_auth_workers(), config.get_auth_queue_depth()
+                )
+        Server.rooms.max_rooms = config.get_max_rooms()
+        Server.outbound_limits = config.get_outbound_limits()
+        Server.sessions = SessionStore(
+                config.get_session_ttl(), config.get_max_sessions()
+                )
+
+        if (game_log := config.get_game_log()) is not None:
+            GameSession.log = GameLog(
+                    game_log, config.get_game_log_segment_bytes()
+                    )
+
+        Server.register_metrics()
+
+        if (admin_port := config.get_admin_port()) is not None:
+            serve_metrics(admin_port)
 
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -192,86 +592,285 @@ class Server:
 
         self.socket.listen()
 
-        print(
-              f"Server started on ip {host}, port {port}, awaiting connection..."
-              )
+        # connections wait in the backlog until accounts can be looked up
+        if config.get_lazy_users():
+            config.users.index()
+            Server.logins.source = config.users
+
+        logger.info(
+                "Server started on ip %s, port %s, awaiting connection...",
+                host, port
+                )
 
     @staticmethod
-    def play_game(room: Room) -> None:
-        #TODO: create end game func
-        # - Set all players/spectators to not in game
-
-        clients: list[Client] = []
-        players: list[Client] = []
-
-        for client in Server.clients:
-            # client not in room
-            if (
-                    client.name not in room.players
-                    and client.name not in room.viewers
-                    ):
-                continue
+    def room_clients(room: Room) -> list[Client]:
+        """
+        Returns every connected client that is a player or viewer in room
+        """
+        return list(room.clients)
+
+    @staticmethod
+    def broadcast(
+            room: Room,
+            msg: str,
+            droppable: bool = False,
+            players: bool = True,
+            viewers: bool = True
+            ) -> None:
+        """
+        Encodes msg once and sends the same frame to the players and/or
+        viewers in room. If droppable, viewers who have fallen behind may skip
+        it
+        """
+        frame = encode_frame(msg.encode())
 
+        for client in Server.room_clients(room):
             if client.name in room.players:
-                players.append(client)
-                client.playing_game = True
+                if players:
+                    client.send_frame(frame)
+            elif viewers:
+                client.send_frame(frame, droppable)
 
-            clients.append(client)
-            client.send_message(
-                    f"BEGIN:{room.players[0]}:{room.players[1]}"
-                    .encode()
-                    )
+        if serverlog.tracing:
+            serverlog.trace("%s to room %s", msg, room.name)
 
-        if players[0].name != room.players[0]:
-            players.reverse()
-        
-        while True:
-            # index of player who is currently having their turn
-            i = 1 - room.cross_turn
+    @staticmethod
+    def publish(room: Room, msgs: list[str]) -> None:
+        """
+        Broadcasts the messages from a GameSession event to whoever they are
+        for
+        """
+        for msg in msgs:
+            if msg.startswith("BOARDSTATUS:"):
+                Server.broadcast(room, msg, viewers = False)
+            elif msg.startswith("MOVE:"):
+                # a viewer missing one resyncs from a snapshot
+                Server.broadcast(room, msg, True, players = False)
+            else:
+                Server.broadcast(room, msg)
 
-            # assumes will recieve PLACE message
-            data = players[i].socket.recv(8192).decode()
+    @staticmethod
+    def start_game(room: Room) -> None:
+        """
+        Sends BEGIN to the room, moves then arrive as PLACE/FORFEIT commands
+        on each player's own connection
+        """
+        with room.session.lock:
+            Server.publish(room, room.session.start())
 
-            if not data:
-                msg = f"GAMEEND:{room.get_board_status()}:2:{players[1 - i]}"
-                map(lambda c : c.send_message(msg.encode()), clients)
+    @staticmethod
+    def handle_move(client: Client, cmd: str, args: list[str]) -> None:
+        """
+        Passes a PLACE or FORFEIT sent by client to the game in its room
+        """
+        room = client.room
+
+        if room is None or client.name is None:
+            return
+
+        if cmd == "PLACE":
+            try:
+                x, y = map(lambda x : int(x), args)
+            except ValueError:
                 return
 
-            x, y = map(lambda x : int(x), data.split(":")[1:])
+        with room.session.lock:
+            if cmd == "FORFEIT":
+                msgs = room.session.forfeit(client.name)
+            else:
+                msgs = room.session.place(client.name, x, y)
 
-            room.make_move(x, y)
+            Server.publish(room, msgs)
 
-            if (code := room.check_for_game_end()):
-                msg = f"GAMEEND:{room.get_board_status()}:{code - 1}"
+            if room.session.state == GameSession.FINISHED:
+                Server.reclaim_room(room)
 
-                # game won
-                if code == 1:
-                    msg += room.players[i]
+    @staticmethod
+    def leave_room(client: Client) -> None:
+        """
+        Forfeits any game the client is playing and leaves its room,
+        reclaiming the room if that ends the game or empties it
+        """
+        if (room := client.room) is None:
+            return
 
-                map(lambda c : c.send_message(msg.encode()), clients)
-                return
+        with room.session.lock:
+            if client.name is not None:
+                Server.publish(room, room.session.forfeit(client.name))
+                Server.rooms.leave(room.name, client.name)
+
+            room.clients.pop(client, None)
+            client.room = None
+
+            if room.session.state == GameSession.FINISHED or room.is_empty():
+                Server.reclaim_room(room)
+
+    @staticmethod
+    def disconnect(client: Client) -> None:
+        """
+        Forfeits any game the client is playing, leaves its room and logs
+        them out
+        """
+        Server.leave_room(client)
+        Server.clients.discard(client)
+        client.close()
+
+    @staticmethod
+    def reclaim_room(room: Room) -> None:
+        """
+        Removes a finished or abandoned room so its name and slot can be
+        reused
+        """
+        with room.session.lock:
+            for client in Server.room_clients(room):
+                client.room = None
+
+            Server.rooms.remove(room.name)
+
+    @staticmethod
+    def outbound_metrics() -> dict[str, int]:
+        clients = list(Server.clients)
+        return {
+                "queued_bytes": sum(c.outbound.size for c in clients),
+                "max_queued_bytes": max(
+                    (c.outbound.size for c in clients), default = 0
+                    ),
+                "dropped_frames": Server.dropped_frames + sum(
+                    c.outbound.dropped for c in clients
+                    ),
+                "evicted_clients": Server.evicted_clients,
+                }
 
-            print(code) 
+    @staticmethod
+    def register_metrics() -> None:
+        """
+        Gauges are read when metrics are collected, see metrics.Registry
+        """
+        REGISTRY.gauge(
+                "tictactoe_connections", "Connected clients",
+                lambda : len(Server.clients)
+                )
+        REGISTRY.gauge(
+                "tictactoe_rooms", "Rooms that exist", lambda : len(Server.rooms)
+                )
+        REGISTRY.gauge(
+                "tictactoe_games_in_progress", "Games being played",
+                Server.rooms.games_in_progress
+                )
+        REGISTRY.gauge(
+                "tictactoe_sessions", "Session tokens that can be resumed",
+                lambda : len(Server.sessions)
+                )
+        REGISTRY.gauges(
+                "tictactoe_auth", "bcrypt worker pool, see AuthExecutor.metrics",
+                Server.auth.metrics
+                )
+        REGISTRY.gauges(
+                "tictactoe_outbound", "Frames queued for clients",
+                Server.outbound_metrics
+                )
+
+    @staticmethod
+    def observe_command(msg: str, seconds: float) -> None:
+        if (histogram := COMMAND_SECONDS.get(msg.split(":", 1)[0])) is not None:
+            histogram.observe(seconds)
+
+    @staticmethod
+    def reclaim_idle_rooms() -> None:
+        for room in Server.rooms.idle_rooms(Server.config.get_room_idle_timeout()):
+            with room.session.lock:
+                # a player waiting for an opponent would never be told, so
+                # rooms anyone has joined since are left alone
+                if not room.clients:
+                    Server.reclaim_room(room)
+
+    def sweep_rooms(self) -> None:
+        """
+        Reclaims idle rooms every ROOM_SWEEP_INTERVAL seconds, run on its own
+        thread
+        """
+        while True:
+            time.sleep(ROOM_SWEEP_INTERVAL)
+            Server.reclaim_idle_rooms()
 
-            room.alternate_turn()
-            board_status: str = room.get_board_status()
-            for client in clients:
-                client.send_message(
-                        f"BOARDSTATUS:{board_status}"
-                        .encode()
-                        )
+    async def sweep_rooms_async(self) -> None:
+        while True:
+            await asyncio.sleep(ROOM_SWEEP_INTERVAL)
+            Server.reclaim_idle_rooms()
 
     def listen(self) -> None:
+        """
+        Listens for connections using the mode set in the server config
+        """
+        if Server.config.get_server_mode() == "asyncio":
+            asyncio.run(self.listen_async())
+            return
+
+        self.listen_threaded()
+
+    async def listen_async(self) -> None:
+        """
+        Serves every connection from a single event loop
+        """
+        server = await asyncio.start_server(
+                self.handle_async_client, sock = self.socket
+                )
+        # kept so the task isn't garbage collected while running
+        sweeper = asyncio.create_task(self.sweep_rooms_async())
+
+        async with server:
+            await server.serve_forever()
+
+    async def handle_async_client(
+            self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+            ) -> None:
+        """
+        Coroutine to handle a client on the event loop
+        """
+        logger.debug("Connection from %s", writer.get_extra_info("peername"))
+
+        client = AsyncClient(writer)
+        Server.clients.add(client)
+        decoder = FrameDecoder()
+        writing = asyncio.create_task(client.write_outbound_async())
+
+        # cleaned up even if a handler raises
+        try:
+            while True:
+                try:
+                    data = await reader.read(decoder.max_length)
+                except ConnectionError:
+                    data = b""
+
+                try:
+                    msgs = decoder.feed(data) if data else None
+                except FrameTooLong:
+                    msgs = None
+
+                if msgs is None:
+                    return
+
+                RECEIVED_BYTES.inc(len(data))
+
+                await self.handle_async_commands(client, msgs)
+        finally:
+            Server.disconnect(client)
+            await writing
+
+    def listen_threaded(self) -> None:
         """
         Listens for connections and spawns a thread for each one
         """
+        Thread(target = self.sweep_rooms, daemon = True).start()
+
         while True:
             conn, addr = self.socket.accept()
-            print("Connection from: ", addr)
+            logger.debug("Connection from %s", addr)
 
             client = Client(conn)
 
-            Server.clients.append(client)
+            Server.clients.add(client)
+            Thread(target = client.write_outbound, daemon = True).start()
 
             # starts client in new thread
             Thread(target = self.handle_new_client, args = (client,)).start()
@@ -280,69 +879,139 @@ class Server:
         """
         Function to handle client on a thread
         """
-        while True:
-            if client.playing_game:
-                continue
+        decoder = FrameDecoder()
 
-            msg = client.socket.recv(8192).decode()
-            print("msg: " + msg)
-            
-            if not msg:
-                client.close()
-                return
+        # cleaned up even if a handler raises
+        try:
+            while True:
+                received = decoder.received
 
-            cmd = msg.split(":")[0]
-            args = msg.split(":")[1:]
+                try:
+                    msgs = decoder.read_from(client.socket)
+                except (FrameTooLong, OSError):
+                    msgs = None
 
-            # commands requiring authorisation
-            if cmd in ["ROOMLIST", "CREATE", "JOIN"]:
-                if client.handle_for_badauth():
-                    continue
+                if msgs is None:
+                    return
 
-            match cmd:
-                case "LOGIN":
-                    client.try_login(args)
+                RECEIVED_BYTES.inc(decoder.received - received)
 
-                case "REGISTER":
-                    client.try_register(args)
+                self.handle_commands(client, msgs)
+        finally:
+            Server.disconnect(client)
 
-                case "ROOMLIST":
-                    client.roomlist(args)
+    def handle_commands(self, client: Client, msgs: list[str]) -> None:
+        """
+        Runs every command received in a single read in order, sending all of
+        the replies together
+        """
+        client.start_batch()
 
-                case "CREATE":
-                    client.create_room(args)
+        try:
+            for msg in msgs:
+                if serverlog.tracing:
+                    serverlog.trace(
+                            "%s from %s", serverlog.redact(msg, True), client.name
+                            )
+                # threaded clients block here while bcrypt runs
+                started = time.perf_counter()
+                self.handle_command(client, msg)
+                Server.observe_command(msg, time.perf_counter() - started)
+        finally:
+            client.flush()
+
+    async def handle_async_commands(
+            self, client: AsyncClient, msgs: list[str]
+            ) -> None:
+        """
+        Event loop version of handle_commands, yields to other connections
+        while a command waits on the auth pool
+        """
+        client.start_batch()
 
-                case "JOIN":
-                    client.join_room(args)
+        try:
+            for msg in msgs:
+                if serverlog.tracing:
+                    serverlog.trace(
+                            "%s from %s", serverlog.redact(msg, True), client.name
+                            )
+                started = time.perf_counter()
+                self.handle_command(client, msg)
+
+                # a deferred callback may defer again
+                while (waiting := client.waiting) is not None:
+                    client.waiting = None
+                    client.flush()
+                    await asyncio.wait([waiting])
+                    client.start_batch()
+
+                Server.observe_command(msg, time.perf_counter() - started)
+        finally:
+            client.flush()
+
+    def handle_command(self, client: Client, msg: str) -> None:
+        """
+        Runs the handler for a single message sent by client
+        """
+        cmd = msg.split(":")[0]
+        args = msg.split(":")[1:]
 
-                case "QUIT":
-                    self.close()
+        # commands requiring authorisation
+        if cmd in ["ROOMLIST", "CREATE", "JOIN", "PLACE", "FORFEIT", "RESYNC"]:
+            if client.handle_for_badauth():
+                return
 
-    @staticmethod
-    def register_account(name: str, password: str) -> None:
-        hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+        match cmd:
+            case "LOGIN":
+                client.try_login(args)
 
-        new_account = {
-                "username" : name,
-                "password" : hash.decode()
-                }
+            case "REGISTER":
+                client.try_register(args)
+
+            case "RESUME":
+                client.try_resume(args)
+
+            case "ROOMLIST":
+                client.roomlist(args)
+
+            case "CREATE":
+                client.create_room(args)
 
-        with open(Server.config.get_userdatabase_path(), "r") as f:
-            accounts = json.load(f)
+            case "JOIN":
+                client.join_room(args)
 
-        accounts.append(new_account)
-        Server.logins.add_account(name, hash.decode())
+            case "PLACE" | "FORFEIT":
+                Server.handle_move(client, cmd, args)
 
-        with open(Server.config.get_userdatabase_path(), "w") as f:
-            json.dump(accounts, f, indent = 4)
+            case "RESYNC":
+                client.resync()
+
+            case "QUIT":
+                self.close()
+
+    @staticmethod
+    def register_account(name: str, hash: str) -> Future:
+        """
+        takes password as str hash. The account can be logged into straight
+        away, the returned future resolves once it has been saved
+        """
+        Server.logins.add_account(name, hash)
+        return Server.config.users.add(name, hash)
 
     # TODO: remove for submission
     def close(self):
-        for client in self.clients:
+        for client in list(self.clients):
             client.close()
 
         time.sleep(1)
 
+        Server.auth.shutdown()
+
+        if GameSession.log is not None:
+            GameSession.log.close()
+
+        serverlog.stop()
+
         self.socket.close()
         os._exit(0)
 
@@ -355,6 +1024,7 @@ class Config:
                 )
 
     def __init__(self, config_path: str) -> None:
+        self.users: UserStore
         self.parse_config(os.path.expanduser(config_path))
         self.parse_users()
 
@@ -366,23 +1036,140 @@ class Config:
                              )
             os._exit(0)
 
+        if self.get_server_mode() not in ["threaded", "asyncio"]:
+            sys.stderr.write(
+                    "Invalid serverMode, expecting 'threaded' or 'asyncio'\n"
+                    )
+            os._exit(1)
+
+        if self.get_log_level() not in serverlog.LEVELS:
+            sys.stderr.write(
+                    "Invalid logLevel, expecting one of "
+                    f"{', '.join(serverlog.LEVELS)}\n"
+                    )
+            os._exit(1)
+
     def get_userdatabase_path(self) -> str:
         return os.path.expanduser(self.config["userDatabase"])
 
     def get_port(self) -> int:
         return int(self.config["port"])
 
+    def get_auth_workers(self) -> int | None:
+        """
+        Number of bcrypt worker processes, defaults to one per core
+        """
+        return self.config.get("authWorkers")
+
+    def get_auth_queue_depth(self) -> int:
+        return int(self.config.get("authQueueDepth", 1024))
+
+    def get_session_ttl(self) -> float:
+        """
+        Seconds a session token can be used to RESUME a login
+        """
+        return float(self.config.get("sessionTTL", 3600))
+
+    def get_max_sessions(self) -> int:
+        return int(self.config.get("maxSessions", 100_000))
+
+    def get_user_store(self) -> str:
+        """
+        Format of the userDatabase file, "json" (default), "journal" or
+        "sqlite". Use userstore.py to import a JSON database into the others
+        """
+        return self.config.get("userStore", "json")
+
+    def get_lazy_users(self) -> bool:
+        """
+        If true, accounts are looked up in the user store as they are needed
+        rather than all loaded at startup
+        """
+        return bool(self.config.get("lazyUsers", False))
+
+    def get_max_rooms(self) -> int:
+        return int(self.config.get("maxRooms", 256))
+
+    def get_room_idle_timeout(self) -> float:
+        """
+        Seconds a room without a game in progress can go unused before it is
+        reclaimed. Rooms with anyone still in them are kept
+        """
+        return float(self.config.get("roomIdleTimeout", 600))
+
+    def get_outbound_limits(self) -> tuple[int, int, int]:
+        """
+        Bytes that may be queued for a client before it counts as congested,
+        before it stops counting as congested, and before a viewer is evicted
+        """
+        return (
+                int(self.config.get("outboundHighWatermark", 64 * 1024)),
+                int(self.config.get("outboundLowWatermark", 16 * 1024)),
+                int(self.config.get("outboundMaxBytes", 1024 * 1024)),
+                )
+
+    def get_game_log(self) -> str | None:
+        """
+        Directory to record every game's events in, see gamelog. Games aren't
+        recorded if unset
+        """
+        if (path := self.config.get("gameLog")) is None:
+            return None
+
+        return os.path.expanduser(path)
+
+    def get_game_log_segment_bytes(self) -> int:
+        return int(self.config.get("gameLogSegmentBytes", 64 * 1024 * 1024))
+
+    def get_admin_port(self) -> int | None:
+        """
+        Local port to serve metrics on in the Prometheus text format, at
+        /metrics. Metrics aren't served if unset
+        """
+        if (port := self.config.get("adminPort")) is None:
+            return None
+
+        return int(port)
+
+    def get_log_level(self) -> str:
+        """
+        "INFO" (default) logs startup, "DEBUG" adds every connection and
+        "TRACE" every frame sent or received
+        """
+        return self.config.get("logLevel", "INFO")
+
+    def get_log_file(self) -> str | None:
+        """
+        File to append the log to, stdout if unset
+        """
+        if (path := self.config.get("logFile")) is None:
+            return None
+
+        return os.path.expanduser(path)
+
+    def get_trace_every(self) -> int:
+        """
+        Only 1 in this many frames is logged at TRACE
+        """
+        return int(self.config.get("logTraceEvery", 1))
+
+    def get_server_mode(self) -> str:
+        """
+        Returns "threaded" (default) or "asyncio"
+        """
+        return self.config.get("serverMode", "threaded")
+
     def parse_users(self) -> None:
         user_config = os.path.expanduser(self.config["userDatabase"])
         try:
-            with open(user_config, 'r') as f:
-                users = json.load(f)
-                if not isinstance(users, list):
-                    raise TypeError
+            self.users = open_user_store(self.get_user_store(), user_config)
+
+            # the server indexes the store once its port is bound
+            if self.get_lazy_users():
+                return
 
-                for user in users:
-                    Config.is_valid_user_json(user)
-                    Server.logins.add_account(user["username"], user["password"])
+            for username, hash in self.users.load():
+                Server.logins.add_account(username, hash)
 
         except FileNotFoundError:
             sys.stderr.write(
@@ -431,6 +1218,12 @@ class Config:
                     )
             os._exit(1)
 
+        if self.get_user_store() not in ["json", "journal", "sqlite"]:
+            sys.stderr.write(
+                    "Invalid userStore, expecting 'json', 'journal' or 'sqlite'\n"
+                    )
+            os._exit(1)
+
 def main(args: list[str]) -> None:
     if len(args) != 1:
         sys.stderr.write("Error: Expecting 1 argument <server config path>.\n")
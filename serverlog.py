@@ -0,0 +1,112 @@
+import sys
+import queue
+import logging
+import itertools
+from logging.handlers import QueueHandler, QueueListener
+
+__all__ = [
+    "TRACE",
+    "LEVELS",
+    "logger",
+    "tracing",
+    "trace",
+    "redact",
+    "start",
+    "stop"
+]
+
+
+# below DEBUG, for a line per frame sent or received
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+LEVELS = ["TRACE", "DEBUG", "INFO", "WARNING", "ERROR"]
+
+logger = logging.getLogger("tictactoe")
+# until start is called nothing is handled, see logging.lastResort
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+# whether trace is enabled. Checked by callers before trace so building its
+# arguments costs nothing when it isn't
+tracing = False
+
+# frames whose arguments are passwords or session tokens, as received from
+# and sent to clients
+RECEIVED_SECRETS = {"LOGIN", "REGISTER", "RESUME"}
+SENT_SECRETS = {"SESSION"}
+
+_frames = itertools.count()
+_trace_every = 1
+_listener: QueueListener | None = None
+
+
+def trace(msg: str, *args) -> None:
+    """
+    Logs 1 in every trace_every calls at TRACE, arguments are only formatted
+    for the calls that are logged
+    """
+    if next(_frames) % _trace_every == 0:
+        logger.log(TRACE, msg, *args)
+
+
+def redact(msg: str, received: bool) -> str:
+    """
+    msg with the arguments of secret frames hidden, for frames to be traced.
+    received is whether msg was received from a client or is being sent to one
+    """
+    kind, separator, _ = msg.partition(":")
+
+    if separator and kind in (RECEIVED_SECRETS if received else SENT_SECRETS):
+        return f"{kind}:<redacted>"
+
+    return msg
+
+
+def start(
+        level: str = "INFO", path: str | None = None, trace_every: int = 1
+        ) -> None:
+    """
+    Writes records of level and above to path, or stdout if None. Records
+    are put on a queue and written by a background thread, so logging never
+    waits on a slow pipe or disk
+    """
+    global tracing, _trace_every, _listener
+
+    stop()
+
+    if path is None:
+        handler = logging.StreamHandler(sys.stdout)
+    else:
+        handler = logging.FileHandler(path)
+
+    handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+            )
+
+    records = queue.SimpleQueue()
+    logger.handlers = [QueueHandler(records)]
+    logger.setLevel(logging.getLevelName(level))
+
+    tracing = logger.isEnabledFor(TRACE)
+    _trace_every = max(1, trace_every)
+    _listener = QueueListener(records, handler)
+    _listener.start()
+
+
+def stop() -> None:
+    """
+    Writes every record still queued and stops the background thread
+    """
+    global tracing, _listener
+
+    if _listener is None:
+        return
+
+    tracing = False
+    logger.handlers = []
+    _listener.stop()
+
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
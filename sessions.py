@@ -0,0 +1,97 @@
+import re
+import hmac
+import time
+import secrets
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+__all__ = [
+    "SessionStore"
+]
+
+
+# a 16 byte nonce and its SHA-256 signature, in hex
+TOKEN = re.compile(r"[0-9a-f]{32}\.[0-9a-f]{64}")
+
+
+class SessionStore:
+    """
+    In memory store of session tokens issued after a successful login, so a
+    client that reconnects can RESUME without its password being rehashed.
+    Tokens expire after ttl seconds and the least recently used are evicted
+    once max_sessions are live. Tokens are signed with a key that only lives
+    as long as the process, so forged tokens are rejected before any lookup
+    """
+    def __init__(self, ttl: float = 3600, max_sessions: int = 100_000) -> None:
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._key = secrets.token_bytes(32)
+
+        # token -> (username, expiry), oldest use first
+        self._sessions: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def _sign(self, nonce: str) -> bytes:
+        return hmac.new(
+                self._key, nonce.encode(), hashlib.sha256
+                ).hexdigest().encode()
+
+    @staticmethod
+    def is_well_formed(token: str) -> bool:
+        """
+        Whether token is in the format issue returns, whether or not it is
+        valid
+        """
+        return TOKEN.fullmatch(token) is not None
+
+    def issue(self, username: str) -> str:
+        """
+        Returns a new token for username, contains only hex digits and '.'
+        """
+        nonce = secrets.token_hex(16)
+        token = f"{nonce}.{self._sign(nonce).decode()}"
+
+        now = time.monotonic()
+
+        with self._lock:
+            self._sessions[token] = (username, now + self.ttl)
+
+            # every token has the same ttl, so the least recently issued are
+            # also the first to expire
+            while self._sessions and (
+                    len(self._sessions) > self.max_sessions
+                    or next(iter(self._sessions.values()))[1] < now
+                    ):
+                self._sessions.popitem(last = False)
+
+        return token
+
+    def resume(self, token: str) -> str | None:
+        """
+        Returns the username the token was issued to, or None if it is forged,
+        expired or unknown. Tokens are single use, issue a new one after
+        """
+        if not SessionStore.is_well_formed(token):
+            return None
+
+        nonce, _, signature = token.partition(".")
+
+        if not hmac.compare_digest(signature.encode(), self._sign(nonce)):
+            return None
+
+        with self._lock:
+            session = self._sessions.pop(token, None)
+
+        if session is None:
+            return None
+
+        username, expiry = session
+
+        if time.monotonic() > expiry:
+            return None
+
+        return username
+
+    def __len__(self) -> int:
+        return len(self._sessions)
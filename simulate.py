@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor
+import game
+import bitboard
+import perfect
+
+__all__ = [
+    "STRATEGIES",
+    "ENGINES",
+    "Stats",
+    "play_games",
+    "simulate"
+]
+
+
+# games each worker plays before reporting back
+CHUNK_SIZE = 10_000
+# chunks given to the pool ahead of the results being read
+MAX_IN_FLIGHT = 4
+
+# every cell bit not in each possible set of occupied cells
+_FREE = tuple(
+    tuple(
+        1 << i for i in range(bitboard.SIZE * bitboard.SIZE) if not taken >> i & 1
+    )
+    for taken in range(bitboard.FULL + 1)
+)
+CENTRE = bitboard.cell(bitboard.SIZE // 2, bitboard.SIZE // 2)
+
+#############################################################
+############### Private functions—do not use! ###############
+#############################################################
+
+# each strategy picks the cell bit to play for the player holding mine
+
+def _random(mine: int, theirs: int, rng: random.Random) -> int:
+    return rng.choice(_FREE[mine | theirs])
+
+
+def _greedy(mine: int, theirs: int, rng: random.Random) -> int:
+    """
+    Wins if it can, otherwise blocks, otherwise takes the centre, otherwise
+    plays randomly
+    """
+    free = _FREE[mine | theirs]
+
+    for bit in free:
+        if bitboard.wins(mine | bit):
+            return bit
+
+    for bit in free:
+        if bitboard.wins(theirs | bit):
+            return bit
+
+    if CENTRE in free:
+        return CENTRE
+
+    return rng.choice(free)
+
+
+def _perfect(mine: int, theirs: int, rng: random.Random) -> int:
+    return bitboard.cell(*perfect.best_move(mine, theirs))
+
+
+STRATEGIES = {
+    "random": _random,
+    "greedy": _greedy,
+    "perfect": _perfect
+}
+
+
+def _play_bitboard(crosses_strategy, noughts_strategy, rng) -> tuple[str, int]:
+    """
+    Returns the result as game.CROSS, game.NOUGHT or game.EMPTY for a draw,
+    and the number of moves made
+    """
+    mine, theirs = 0, 0
+    strategies = (crosses_strategy, noughts_strategy)
+    moves = 0
+
+    while True:
+        mine |= strategies[moves & 1](mine, theirs, rng)
+        moves += 1
+
+        if bitboard.wins(mine):
+            return (game.NOUGHT if moves & 1 == 0 else game.CROSS), moves
+
+        if bitboard.is_full(mine, theirs):
+            return game.EMPTY, moves
+
+        mine, theirs = theirs, mine
+
+
+def _play_game(crosses_strategy, noughts_strategy, rng) -> tuple[str, int]:
+    """
+    Same as _play_bitboard, but keeps a board from game.create_board and
+    checks it with game.player_wins and game.players_draw
+    """
+    board = game.create_board()
+    players = (game.CROSS, game.NOUGHT)
+    strategies = (crosses_strategy, noughts_strategy)
+    held = [0, 0]
+    moves = 0
+
+    while True:
+        turn = moves & 1
+        bit = strategies[turn](held[turn], held[1 - turn], rng)
+        held[turn] |= bit
+        i = bit.bit_length() - 1
+        board[i // bitboard.SIZE][i % bitboard.SIZE] = players[turn]
+        moves += 1
+
+        if game.player_wins(players[turn], board):
+            return players[turn], moves
+
+        if game.players_draw(board):
+            return game.EMPTY, moves
+
+
+ENGINES = {
+    "bitboard": _play_bitboard,
+    "game": _play_game
+}
+
+##########################################################
+############### Public functions—use these ###############
+##########################################################
+
+class Stats:
+    """
+    Running totals over any number of games, so results never have to be
+    kept per game
+    """
+    def __init__(self) -> None:
+        self.games = 0
+        self.cross_wins = 0
+        self.nought_wins = 0
+        self.draws = 0
+        self.moves = 0
+
+    def add(self, result: str, moves: int) -> None:
+        self.games += 1
+        self.moves += moves
+
+        if result == game.CROSS:
+            self.cross_wins += 1
+        elif result == game.NOUGHT:
+            self.nought_wins += 1
+        else:
+            self.draws += 1
+
+    def merge(self, other: "Stats") -> None:
+        self.games += other.games
+        self.cross_wins += other.cross_wins
+        self.nought_wins += other.nought_wins
+        self.draws += other.draws
+        self.moves += other.moves
+
+    def summary(self) -> str:
+        games = self.games or 1
+        return (
+                f"{self.games} games, crosses {self.cross_wins / games:.1%},"
+                f" noughts {self.nought_wins / games:.1%},"
+                f" draws {self.draws / games:.1%},"
+                f" {self.moves / games:.2f} moves per game"
+                )
+
+
+def play_games(
+        n: int, crosses: str, noughts: str, seed: int, engine: str = "bitboard"
+        ) -> Stats:
+    """
+    Plays n games in this process between the named strategies
+    """
+    rng = random.Random(seed)
+    play = ENGINES[engine]
+    crosses_strategy, noughts_strategy = STRATEGIES[crosses], STRATEGIES[noughts]
+
+    stats = Stats()
+    for _ in range(n):
+        stats.add(*play(crosses_strategy, noughts_strategy, rng))
+
+    return stats
+
+
+def simulate(
+        n: int,
+        crosses: str,
+        noughts: str,
+        workers: int | None = None,
+        engine: str = "bitboard",
+        seed: int = 0,
+        on_progress = None
+        ) -> tuple[Stats, float]:
+    """
+    Plays n games split into chunks across a pool of processes, merging each
+    chunk's totals as it finishes. on_progress is called with the totals so
+    far after every chunk. Returns the totals and the seconds taken
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [
+        min(CHUNK_SIZE, n - start) for start in range(0, n, CHUNK_SIZE)
+    ]
+
+    total = Stats()
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        pending = []
+
+        for i, size in enumerate(chunks):
+            pending.append(pool.submit(
+                    play_games, size, crosses, noughts, seed + i, engine
+                    ))
+
+            # keep a bounded number of chunks queued rather than all of them
+            if len(pending) >= workers * MAX_IN_FLIGHT:
+                total.merge(pending.pop(0).result())
+                if on_progress is not None:
+                    on_progress(total, time.perf_counter() - start)
+
+        for future in pending:
+            total.merge(future.result())
+            if on_progress is not None:
+                on_progress(total, time.perf_counter() - start)
+
+    return total, time.perf_counter() - start
+
+
+def main(args: list[str]) -> None:
+    if (
+            not 3 <= len(args) <= 5
+            or not args[0].isdigit()
+            or args[1] not in STRATEGIES
+            or args[2] not in STRATEGIES
+            or (len(args) > 3 and not args[3].isdigit())
+            or (len(args) > 4 and args[4] not in ENGINES)
+            ):
+        sys.stderr.write(
+                "Usage: simulate.py <games> <crosses strategy> <noughts strategy>"
+                " [workers] [engine]\n"
+                f"Strategies: {', '.join(STRATEGIES)}\n"
+                f"Engines: {', '.join(ENGINES)}\n"
+                )
+        os._exit(1)
+
+    n, crosses, noughts = int(args[0]), args[1], args[2]
+    workers = int(args[3]) if len(args) > 3 else None
+    engine = args[4] if len(args) > 4 else "bitboard"
+
+    def on_progress(stats: Stats, elapsed: float) -> None:
+        print(
+                f"\r{stats.games}/{n} games, {stats.games / elapsed:,.0f} games/s",
+                end = "",
+                flush = True
+                )
+
+    stats, elapsed = simulate(
+            n, crosses, noughts, workers, engine, on_progress = on_progress
+            )
+
+    print()
+    print(f"{crosses} vs {noughts} on {engine}: {stats.summary()}")
+    print(f"{elapsed:.2f}s, {stats.games / elapsed:,.0f} games/s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
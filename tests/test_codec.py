@@ -0,0 +1,116 @@
+"""
+FrameDecoder's handling of frames split across reads, several frames in one
+read and the frame length limit, and skip_sent after partial writes
+
+    python -m pytest tests
+"""
+import os
+import sys
+import socket
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from codec import FrameDecoder, FrameTooLong, encode_frame, skip_sent
+
+
+class TestFrameDecoder(unittest.TestCase):
+    def test_frame_split_across_reads(self):
+        decoder = FrameDecoder()
+
+        self.assertEqual(decoder.feed(b"LOGIN:al"), [])
+        self.assertEqual(decoder.feed(b"ice:p"), [])
+        self.assertEqual(decoder.feed(b"w\n"), ["LOGIN:alice:pw"])
+
+    def test_several_frames_in_one_read(self):
+        decoder = FrameDecoder()
+
+        self.assertEqual(
+                decoder.feed(b"ROOMLIST:PLAYER\nJOIN:r:PLAYER\nPLACE:0"),
+                ["ROOMLIST:PLAYER", "JOIN:r:PLAYER"]
+                )
+        self.assertEqual(decoder.feed(b":1\n"), ["PLACE:0:1"])
+
+    def test_empty_frames_are_skipped(self):
+        self.assertEqual(FrameDecoder().feed(b"\n\nQUIT\n\n"), ["QUIT"])
+
+    def test_frame_of_exactly_max_length(self):
+        decoder = FrameDecoder(max_length = 16)
+        frame = b"x" * 16
+
+        self.assertEqual(decoder.feed(frame + b"\n"), [frame.decode()])
+        # the buffer is reused for the next frame
+        self.assertEqual(decoder.feed(frame + b"\n"), [frame.decode()])
+
+    def test_frame_over_max_length(self):
+        with self.assertRaises(FrameTooLong):
+            FrameDecoder(max_length = 16).feed(b"x" * 17 + b"\n")
+
+    def test_unterminated_frame_over_max_length(self):
+        decoder = FrameDecoder(max_length = 16)
+        decoder.feed(b"x" * 10)
+
+        with self.assertRaises(FrameTooLong):
+            decoder.feed(b"x" * 10)
+
+    def test_large_read_of_many_frames(self):
+        decoder = FrameDecoder(max_length = 16)
+        frames = [f"PLACE:{i % 3}:{i % 5}" for i in range(1000)]
+
+        self.assertEqual(
+                decoder.feed(b"".join(encode_frame(f.encode()) for f in frames)),
+                frames
+                )
+
+    def test_invalid_utf8_is_replaced(self):
+        self.assertEqual(FrameDecoder().feed(b"A\xff\n"), ["A�"])
+
+    def test_counts_bytes_received(self):
+        decoder = FrameDecoder()
+        decoder.feed(b"QUIT\nPLA")
+
+        self.assertEqual(decoder.received, 8)
+
+    def test_read_from(self):
+        server_side, client_side = socket.socketpair()
+        decoder = FrameDecoder()
+
+        with server_side, client_side:
+            client_side.sendall(b"LOGIN:a:b\nRES")
+            self.assertEqual(decoder.read_from(server_side), ["LOGIN:a:b"])
+
+            client_side.sendall(b"YNC\n")
+            self.assertEqual(decoder.read_from(server_side), ["RESYNC"])
+
+            client_side.shutdown(socket.SHUT_WR)
+            self.assertIsNone(decoder.read_from(server_side))
+
+
+class TestSkipSent(unittest.TestCase):
+    def test_nothing_sent(self):
+        self.assertEqual(skip_sent([b"ab", b"cd"], 0), [b"ab", b"cd"])
+
+    def test_everything_sent(self):
+        self.assertEqual(skip_sent([b"ab", b"cd"], 4), [])
+
+    def test_whole_frames_sent(self):
+        self.assertEqual(skip_sent([b"ab", b"cd", b"ef"], 2), [b"cd", b"ef"])
+
+    def test_part_of_a_frame_sent(self):
+        frames = skip_sent([b"ab", b"cde", b"f"], 3)
+
+        self.assertEqual([bytes(frame) for frame in frames], [b"de", b"f"])
+
+    def test_partial_writes_add_up(self):
+        frames = [b"abc", b"de", b"fghi"]
+        written = b""
+
+        while frames:
+            written += bytes(frames[0][:2])
+            frames = skip_sent(frames, min(2, len(frames[0])))
+
+        self.assertEqual(written, b"abcdefghi")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+OutboundQueue's byte accounting, watermarks, dropping of droppable frames
+while congested and eviction
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from outbound import OutboundQueue
+
+
+def queue() -> OutboundQueue:
+    return OutboundQueue(high_watermark = 10, low_watermark = 4, max_bytes = 20)
+
+
+class TestOutboundQueue(unittest.TestCase):
+    def test_take_returns_frames_in_order(self):
+        q = queue()
+        q.push([b"ab"])
+        q.push([b"cd", b"ef"])
+
+        self.assertEqual(q.size, 6)
+        self.assertEqual(q.take(), [b"ab", b"cd", b"ef"])
+        self.assertEqual(len(q), 0)
+
+    def test_sent_frees_bytes(self):
+        q = queue()
+        q.push([b"ab", b"cde"])
+        frames = q.take()
+
+        # frames count until written
+        self.assertEqual(q.size, 5)
+        self.assertEqual(q.sent(frames), 5)
+        self.assertEqual(q.size, 0)
+
+    def test_congested_between_watermarks(self):
+        q = queue()
+        q.push([b"x" * 11])
+        self.assertTrue(q.congested)
+
+        q.push([b"x" * 2])
+        q.sent(q.take()[:1])
+        # 2 bytes left, under the low watermark
+        self.assertFalse(q.congested)
+
+    def test_stays_congested_above_low_watermark(self):
+        q = queue()
+        q.push([b"x" * 6, b"x" * 6])
+        frames = q.take()
+        q.sent(frames[:1])
+
+        self.assertEqual(q.size, 6)
+        self.assertTrue(q.congested)
+
+    def test_droppable_replaces_droppable_while_congested(self):
+        q = queue()
+        q.push([b"keep"])
+        q.push([b"old1"], droppable = True)
+        q.push([b"old2"], droppable = True)
+        self.assertTrue(q.congested)
+
+        q.push([b"new"], droppable = True)
+
+        self.assertEqual(q.take(), [b"keep", b"new"])
+        self.assertEqual(q.dropped, 2)
+        self.assertEqual(q.size, 7)
+
+    def test_nothing_dropped_while_not_congested(self):
+        q = queue()
+        q.push([b"a"], droppable = True)
+        q.push([b"b"], droppable = True)
+
+        self.assertEqual(q.take(), [b"a", b"b"])
+        self.assertEqual(q.dropped, 0)
+
+    def test_evicts_droppable_past_max_bytes(self):
+        q = queue()
+
+        self.assertTrue(q.push([b"x" * 15]))
+        self.assertFalse(q.push([b"x" * 6], droppable = True))
+
+    def test_never_evicts_for_non_droppable(self):
+        self.assertTrue(queue().push([b"x" * 50]))
+
+    def test_send_now_only_queues_what_is_left(self):
+        q = queue()
+        written = []
+
+        def send_now(frames: list[bytes]) -> int:
+            written.append(b"".join(frames))
+            return 3
+
+        q.push([b"ab", b"cde"], send_now = send_now)
+
+        self.assertEqual(written, [b"abcde"])
+        self.assertEqual([bytes(frame) for frame in q.take()], [b"de"])
+        self.assertEqual(q.size, 2)
+
+    def test_send_now_not_used_while_frames_are_queued(self):
+        q = queue()
+        q.push([b"ab"])
+
+        q.push([b"cd"], send_now = lambda frames : self.fail("sent early"))
+        self.assertEqual(q.take(), [b"ab", b"cd"])
+
+    def test_closed_queue(self):
+        q = queue()
+        q.close()
+
+        self.assertTrue(q.push([b"ignored"]))
+        self.assertEqual(q.take(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
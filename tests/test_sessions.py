@@ -0,0 +1,84 @@
+"""
+SessionStore's token format, single use, expiry and eviction
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import sessions
+from sessions import SessionStore
+
+
+class TestSessionStore(unittest.TestCase):
+    def test_resume_returns_username_once(self):
+        store = SessionStore()
+        token = store.issue("alice")
+
+        self.assertTrue(SessionStore.is_well_formed(token))
+        self.assertEqual(store.resume(token), "alice")
+        self.assertIsNone(store.resume(token))
+
+    def test_forged_token(self):
+        store = SessionStore()
+        token = store.issue("alice")
+        forged = token[:-1] + ("0" if token[-1] != "0" else "1")
+
+        self.assertIsNone(store.resume(forged))
+        # still usable after the forgery was rejected
+        self.assertEqual(store.resume(token), "alice")
+
+    def test_token_from_another_store(self):
+        self.assertIsNone(SessionStore().resume(SessionStore().issue("alice")))
+
+    def test_malformed_tokens(self):
+        store = SessionStore()
+
+        for token in ["", ".", "x.é", "é" * 97, "a" * 32 + "." + "A" * 64]:
+            self.assertFalse(SessionStore.is_well_formed(token))
+            self.assertIsNone(store.resume(token))
+
+    def test_expired_token(self):
+        store = SessionStore(ttl = 10)
+
+        with mock.patch.object(sessions.time, "monotonic", return_value = 100):
+            token = store.issue("alice")
+
+        with mock.patch.object(sessions.time, "monotonic", return_value = 111):
+            self.assertIsNone(store.resume(token))
+
+    def test_expired_tokens_are_evicted(self):
+        store = SessionStore(ttl = 10)
+
+        with mock.patch.object(sessions.time, "monotonic", return_value = 100):
+            store.issue("alice")
+            store.issue("bob")
+
+        with mock.patch.object(sessions.time, "monotonic", return_value = 111):
+            token = store.issue("carol")
+
+            self.assertEqual(len(store), 1)
+            self.assertEqual(store.resume(token), "carol")
+
+    def test_oldest_evicted_past_max_sessions(self):
+        store = SessionStore(max_sessions = 2)
+        tokens = [store.issue(name) for name in ["alice", "bob", "carol"]]
+
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.resume(tokens[0]))
+        self.assertEqual(store.resume(tokens[2]), "carol")
+
+    def test_sessions_disabled(self):
+        for store in [SessionStore(max_sessions = 0), SessionStore(ttl = -1)]:
+            token = store.issue("alice")
+
+            self.assertEqual(len(store), 0)
+            self.assertIsNone(store.resume(token))
+
+
+if __name__ == "__main__":
+    unittest.main()
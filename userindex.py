@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import mmap
+import struct
+import hashlib
+from array import array
+
+__all__ = [
+    "UserIndex"
+]
+
+
+MAGIC = b"UIDX0001"
+# magic, size and mtime of the database when indexed, number of slots
+HEADER = struct.Struct("<8sQQQ")
+
+# a flat JSON object, skipping over any braces inside strings
+OBJECT = re.compile(rb'\{(?:[^{}"]+|"(?:[^"\\]+|\\.)*")*\}')
+USERNAME = re.compile(rb'"username"\s*:\s*"((?:[^"\\]+|\\.)*)"')
+
+# each slot holds (tag << OFFSET_BITS) | (offset + 1), 0 marks an empty slot
+OFFSET_BITS = 40
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+def _hash(username: bytes) -> int:
+    """
+    Takes the UTF-8 encoded username
+    """
+    return int.from_bytes(
+            hashlib.blake2b(username, digest_size = 8).digest(), "little"
+            )
+
+
+def _tag(h: int) -> int:
+    # slots are chosen by the low bits of the hash, so the high bits are kept
+    # to skip most records that don't match without parsing them
+    return h >> OFFSET_BITS
+
+
+class UserIndex:
+    """
+    On disk open addressing hash table from username to the offset of its
+    record in a user database, memory mapped so that opening it costs almost
+    nothing no matter how many accounts there are. Records are only parsed
+    when looked up. The table is saved beside the database as <path>.idx and
+    rebuilt whenever the database has changed since it was made
+    """
+    def __init__(self, db_path: str, append_only: bool = False) -> None:
+        self.db_path = db_path
+        self.index_path = db_path + ".idx"
+
+        # accounts appended to an append only database since it was indexed
+        self._tail: dict[str, str] = {}
+
+        stat = os.stat(db_path)
+
+        if not self._open_index(stat, append_only):
+            self._build(stat)
+            self._open_index(stat, append_only)
+
+        self._db = b""
+        if stat.st_size:
+            with open(db_path, "rb") as f:
+                self._db = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+        if self._indexed_size < stat.st_size:
+            self._read_tail()
+
+    def _open_index(self, stat: os.stat_result, append_only: bool) -> bool:
+        """
+        Maps the saved table, returns False if it is missing or out of date
+        """
+        try:
+            with open(self.index_path, "rb") as f:
+                index = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return False
+
+        if len(index) < HEADER.size:
+            return False
+
+        magic, size, mtime, capacity = HEADER.unpack_from(index)
+
+        fresh = (
+                magic == MAGIC
+                and len(index) == HEADER.size + 8 * capacity
+                and (
+                    (append_only and size <= stat.st_size)
+                    or (size == stat.st_size and mtime == stat.st_mtime_ns)
+                    )
+                )
+
+        if not fresh:
+            index.close()
+            return False
+
+        self._index = index
+        self._slots = memoryview(index)[HEADER.size:].cast("Q")
+        self._mask = capacity - 1
+        self._indexed_size = size
+        return True
+
+    def _build(self, stat: os.stat_result) -> None:
+        with open(self.db_path, "rb") as f:
+            if stat.st_size == 0:
+                db = b""
+            else:
+                db = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+            hashes = array("Q")
+            offsets = array("Q")
+
+            # only the usernames are scanned for, each record is found from
+            # the "{" before its username. This assumes nothing before the
+            # username in a record contains a "{", which holds for bcrypt
+            # hashes. Records are still checked against the username when
+            # looked up
+            for match in USERNAME.finditer(db):
+                username = match.group(1)
+
+                if b"\\" in username:
+                    username = json.loads(b'"' + username + b'"').encode()
+
+                hashes.append(_hash(username))
+                offsets.append(db.rfind(b"{", 0, match.start()))
+
+        capacity = 1
+        while capacity < 2 * len(hashes):
+            capacity *= 2
+
+        mask = capacity - 1
+        slots = array("Q", bytes(8 * capacity))
+
+        for h, offset in zip(hashes, offsets):
+            i = h & mask
+            while slots[i]:
+                i = (i + 1) & mask
+            slots[i] = (_tag(h) << OFFSET_BITS) | (offset + 1)
+
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, stat.st_size, stat.st_mtime_ns, capacity))
+            slots.tofile(f)
+
+        os.replace(tmp_path, self.index_path)
+
+    def _read_tail(self) -> None:
+        for match in OBJECT.finditer(self._db, self._indexed_size):
+            user = json.loads(match.group())
+            self._tail.setdefault(user["username"], user["password"])
+
+    def get(self, username: str) -> str | None:
+        """
+        Returns the password hash stored for username, or None
+        """
+        h = _hash(username.encode())
+        tag = _tag(h)
+        i = h & self._mask
+
+        while (slot := self._slots[i]):
+            if slot >> OFFSET_BITS == tag:
+                offset = (slot & OFFSET_MASK) - 1
+
+                if (
+                        (record := OBJECT.match(self._db, offset)) is not None
+                        and (user := json.loads(record.group()))["username"]
+                            == username
+                        ):
+                    return user["password"]
+
+            i = (i + 1) & self._mask
+
+        return self._tail.get(username)
+
+    def __len__(self) -> int:
+        return sum(1 for slot in self._slots if slot) + len(self._tail)
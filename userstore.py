@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import mmap
+import sqlite3
+from concurrent.futures import Future
+from queue import Queue, Empty
+from threading import Thread, Lock
+from userindex import UserIndex
+
+__all__ = [
+    "UserStore",
+    "JsonUserStore",
+    "JournalUserStore",
+    "SqliteUserStore",
+    "open_user_store",
+    "import_json"
+]
+
+
+Record = tuple[str, str]
+
+
+class UserStore:
+    """
+    Persistent storage for accounts. Writes are made by a single background
+    thread, which takes every record queued since its last write and commits
+    them together, so a burst of registrations shares one sync to disk
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._queue: Queue[tuple[Record, Future]] = Queue()
+        self._writer: Thread | None = None
+
+    def load(self) -> list[Record]:
+        """
+        Returns every stored (username, hash) pair in the order added
+        """
+        raise NotImplementedError
+
+    def _commit(self, records: list[Record]) -> None:
+        """
+        Durably writes records, only returns once they are on disk
+        """
+        raise NotImplementedError
+
+    def index(self) -> None:
+        """
+        Prepares get for looking up accounts without loading all of them
+        """
+        self._index = UserIndex(self.path)
+
+    def get(self, username: str) -> str | None:
+        """
+        Returns the hash stored for username, or None. Call index first.
+        Accounts added since index was called are not guaranteed to be found
+        """
+        return self._index.get(username)
+
+    def add(self, username: str, hash: str) -> Future:
+        """
+        Queues an account to be written, the future resolves once it is durable
+        """
+        if self._writer is None:
+            self._writer = Thread(target = self._write_batches, daemon = True)
+            self._writer.start()
+
+        future = Future()
+        self._queue.put(((username, hash), future))
+        return future
+
+    def _write_batches(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except Empty:
+                pass
+
+            try:
+                self._commit([record for record, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for _, future in batch:
+                future.set_result(None)
+
+
+class JsonUserStore(UserStore):
+    """
+    The original format, a JSON array of {"username", "password"} objects.
+    Each commit rewrites the whole file, via a temporary file so a crash
+    can't leave it half written
+    """
+    def load(self) -> list[Record]:
+        with open(self.path, "r") as f:
+            users = json.load(f)
+
+        if not isinstance(users, list):
+            raise TypeError
+
+        return [(user["username"], user["password"]) for user in users]
+
+    def _commit(self, records: list[Record]) -> None:
+        with open(self.path, "r") as f:
+            accounts = json.load(f)
+
+        for username, hash in records:
+            accounts.append({"username" : username, "password" : hash})
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(accounts, f, indent = 4)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.path)
+
+
+class JournalUserStore(UserStore):
+    """
+    Append only journal with one JSON object per line. A line torn by a crash
+    is dropped when the journal is next loaded
+    """
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self._file = None
+
+    def load(self) -> list[Record]:
+        records = []
+        # end of the last complete record
+        good = 0
+
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+
+                try:
+                    user = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+
+                records.append((user["username"], user["password"]))
+                good += len(line)
+
+        if good != os.path.getsize(self.path):
+            os.truncate(self.path, good)
+
+        return records
+
+    def index(self) -> None:
+        # drop a record torn by a crash before anything is appended after it
+        if (size := os.path.getsize(self.path)):
+            with open(self.path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as data:
+                    good = data.rfind(b"\n") + 1
+
+            if good != size:
+                os.truncate(self.path, good)
+
+        self._index = UserIndex(self.path, append_only = True)
+
+    def _commit(self, records: list[Record]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "ab")
+
+        self._file.write(b"".join(
+            json.dumps({"username" : username, "password" : hash}).encode()
+            + b"\n"
+            for username, hash in records
+            ))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+class SqliteUserStore(UserStore):
+    """
+    SQLite database in WAL mode, each batch of records is one transaction
+    """
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+        self._conn = SqliteUserStore.connect(path)
+        # lookups come from connection threads while the writer commits
+        self._conn_lock = Lock()
+
+    @staticmethod
+    def connect(path: str) -> sqlite3.Connection:
+        # only ever used by one thread at a time, first to load then to write
+        conn = sqlite3.connect(path, check_same_thread = False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(
+                "CREATE TABLE IF NOT EXISTS users "
+                "(username TEXT PRIMARY KEY, password TEXT NOT NULL)"
+                )
+        return conn
+
+    def load(self) -> list[Record]:
+        return self._conn.execute(
+                "SELECT username, password FROM users ORDER BY rowid"
+                ).fetchall()
+
+    def _commit(self, records: list[Record]) -> None:
+        with self._conn_lock, self._conn:
+            self._conn.executemany(
+                    "INSERT OR IGNORE INTO users VALUES (?, ?)", records
+                    )
+
+    def index(self) -> None:
+        # the username is already the table's primary key
+        pass
+
+    def get(self, username: str) -> str | None:
+        with self._conn_lock:
+            row = self._conn.execute(
+                    "SELECT password FROM users WHERE username = ?", (username,)
+                    ).fetchone()
+
+        return row[0] if row else None
+
+
+STORES = {
+    "json": JsonUserStore,
+    "journal": JournalUserStore,
+    "sqlite": SqliteUserStore
+}
+
+
+def open_user_store(kind: str, path: str) -> UserStore:
+    """
+    Raises FileNotFoundError if there is nothing at path
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    return STORES[kind](path)
+
+
+def import_json(json_path: str, kind: str, dest: str) -> int:
+    """
+    Copies the accounts in a JSON user database into a new store at dest,
+    returns the number of accounts copied
+    """
+    records = JsonUserStore(json_path).load()
+
+    if kind == "sqlite":
+        SqliteUserStore.connect(dest).close()
+    else:
+        open(dest, "a").close()
+
+    store = open_user_store(kind, dest)
+    store._commit(records)
+    return len(records)
+
+
+def main(args: list[str]) -> None:
+    if len(args) != 3 or args[1] not in ["journal", "sqlite"]:
+        sys.stderr.write(
+                "Usage: userstore.py <users json> <journal|sqlite> <dest path>\n"
+                )
+        os._exit(1)
+
+    json_path, kind, dest = args
+
+    if os.path.exists(dest):
+        sys.stderr.write(f"Error: {dest} already exists.\n")
+        os._exit(1)
+
+    count = import_json(json_path, kind, dest)
+    print(f"Imported {count} accounts into {dest}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
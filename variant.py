@@ -0,0 +1,116 @@
+import base64
+
+__all__ = [
+    "MIN_SIZE",
+    "MAX_SIZE",
+    "VariantBoard",
+    "is_valid_variant",
+    "unpack_status"
+]
+
+
+MIN_SIZE = 3
+# keeps the largest BOARDSTATUS well inside a frame
+MAX_SIZE = 25
+
+EMPTY, CROSS, NOUGHT = 0, 1, 2
+# each line through a cell is walked both ways along one of these
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+def is_valid_variant(size: int, k: int) -> bool:
+    return MIN_SIZE <= size <= MAX_SIZE and MIN_SIZE <= k <= size
+
+
+class VariantBoard:
+    """
+    size x size board won by getting k in a row. Only the lines through the
+    last move can have been completed by it, so a win is found by walking at
+    most k - 1 cells each way along four lines instead of rescanning the
+    board.
+
+    Alongside a cell per byte, the board keeps the same cells packed into
+    2 bits each, which is what BOARDSTATUS sends for these rooms as
+    "<size>.<base64>" rather than a digit per cell
+    """
+    __slots__ = ("size", "k", "moves", "_cells", "_packed")
+
+    def __init__(self, size: int, k: int) -> None:
+        self.size = size
+        self.k = k
+        self.moves = 0
+        # EMPTY, CROSS or NOUGHT for the cell at y * size + x
+        self._cells = bytearray(size * size)
+        self._packed = bytearray((size * size + 3) // 4)
+
+    def clear(self) -> None:
+        self.moves = 0
+        self._cells[:] = bytes(len(self._cells))
+        self._packed[:] = bytes(len(self._packed))
+
+    def is_valid_move(self, x: int, y: int) -> bool:
+        return (
+                0 <= x < self.size
+                and 0 <= y < self.size
+                and self._cells[y * self.size + x] == EMPTY
+                )
+
+    def place(self, x: int, y: int, cross: bool) -> None:
+        i = y * self.size + x
+        mark = CROSS if cross else NOUGHT
+
+        self._cells[i] = mark
+        self._packed[i >> 2] |= mark << ((i & 3) << 1)
+        self.moves += 1
+
+    def wins_through(self, x: int, y: int) -> bool:
+        """
+        Determines whether the mark at x, y is part of k in a row
+        """
+        size, cells = self.size, self._cells
+        mark = cells[y * size + x]
+
+        for dx, dy in DIRECTIONS:
+            count = 1
+
+            for sign in (1, -1):
+                cx, cy = x + sign * dx, y + sign * dy
+
+                while (
+                        count < self.k
+                        and 0 <= cx < size
+                        and 0 <= cy < size
+                        and cells[cy * size + cx] == mark
+                        ):
+                    count += 1
+                    cx += sign * dx
+                    cy += sign * dy
+
+            if count >= self.k:
+                return True
+
+        return False
+
+    def is_full(self) -> bool:
+        return self.moves == len(self._cells)
+
+    def status(self) -> str:
+        packed = base64.urlsafe_b64encode(self._packed).rstrip(b"=")
+        return f"{self.size}.{packed.decode()}"
+
+
+def unpack_status(status: str) -> str:
+    """
+    Returns the board from a BOARDSTATUS of any room as a digit per cell,
+    row by row, where 0 is empty, 1 is a cross and 2 is a nought
+    """
+    if "." not in status:
+        return status
+
+    size, packed = status.split(".")
+    size = int(size)
+    data = base64.urlsafe_b64decode(packed + "=" * (-len(packed) % 4))
+
+    return "".join(
+            str(data[i >> 2] >> ((i & 3) << 1) & 3) for i in range(size * size)
+            )